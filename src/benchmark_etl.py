@@ -0,0 +1,232 @@
+"""
+Benchmark reproducible del ETL con datos sintéticos con forma de Airbnb.
+
+Mide la extracción (MongoDB simulado con mongomock), cada método
+transformar_* de Transformacion y la ruta de carga masiva de Carga (contra
+SQLite en memoria como sustituto local de SQL Server). Los resultados se
+comparan con un archivo baseline para detectar regresiones.
+
+Uso:
+    python benchmark_etl.py --tamano pequeno --guardar-baseline
+    python benchmark_etl.py --tamano pequeno
+"""
+
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from datos_sinteticos import GeneradorDatos
+from extraccion import Extraccion
+from transformacion import Transformacion
+from carga import Carga
+from validacion import Validacion
+
+try:
+    import mongomock
+except ImportError:
+    mongomock = None
+
+
+TAMANOS = {
+    "pequeno": 10_000,
+    "mediano": 1_000_000,
+    "grande": 10_000_000,
+}
+CARPETA_BENCHMARKS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Benchmarks")
+
+
+class CursorSqlite:
+    """
+    Adaptador mínimo para que Carga.insertar_lotes use un cursor de sqlite3:
+    acepta el atributo fast_executemany de pyodbc y reenvía el resto.
+    """
+
+    def __init__(self, conexion):
+        self.cursor = conexion.cursor()
+        self.fast_executemany = False
+
+    def execute(self, sql, *parametros):
+        return self.cursor.execute(sql, *parametros)
+
+    def executemany(self, sql, parametros):
+        return self.cursor.executemany(sql, parametros)
+
+
+class BenchmarkETL:
+    def __init__(self, tamano="pequeno", tamano_lote=10000, repeticiones=3, max_documentos_mongo=50_000,
+                 procesos=None):
+        self.tamano = tamano
+        self.filas_calendar = TAMANOS[tamano]
+        self.tamano_lote = tamano_lote
+        self.repeticiones = repeticiones
+        self.max_documentos_mongo = max_documentos_mongo
+        self.procesos = procesos or os.cpu_count() or 1
+        self.resultados = {}
+
+        sqlite3.register_adapter(datetime, lambda valor: valor.isoformat(sep=" "))
+        sqlite3.register_adapter(pd.Timestamp, lambda valor: valor.isoformat(sep=" "))
+
+    # ------------------------------------------
+    # MEDICIÓN
+    # ------------------------------------------
+    def medir(self, nombre, funcion, filas, repeticiones=None):
+        tiempos = []
+        resultado = None
+        for _ in range(repeticiones or self.repeticiones):
+            inicio = time.perf_counter()
+            resultado = funcion()
+            tiempos.append(time.perf_counter() - inicio)
+
+        segundos = min(tiempos)
+        self.resultados[nombre] = {
+            "segundos": round(segundos, 4),
+            "filas": int(filas),
+            "filas_por_segundo": round(filas / segundos, 1) if segundos > 0 else None,
+        }
+        print(f"   {nombre:<24} {segundos:>9.3f}s {filas:>12,} filas {filas / segundos if segundos else 0:>14,.0f} filas/s")
+        return resultado
+
+    # ------------------------------------------
+    # ETAPAS
+    # ------------------------------------------
+    def ejecutar(self):
+        print("=" * 70)
+        print(f"⏱️  BENCHMARK ETL ({self.tamano}: {self.filas_calendar:,} filas de calendar)")
+        print("=" * 70)
+
+        inicio = time.perf_counter()
+        listings, reviews, calendar = GeneradorDatos().generar(self.filas_calendar)
+        print(f"\n🧪 Datos generados en {time.perf_counter() - inicio:.1f}s "
+              f"(listings {len(listings):,}, reviews {len(reviews):,}, calendar {len(calendar):,})\n")
+
+        self.medir_extraccion(calendar)
+
+        transformador = Transformacion(nombre_archivo_log="benchmark_log.txt")
+        self.medir("limpiar_precio", lambda: transformador.limpiar_precio(calendar["price"]), len(calendar))
+        self.medir("convertir_fecha", lambda: transformador.convertir_fecha(calendar["date"]), len(calendar))
+        listings_t = self.medir("transformar_listings", lambda: transformador.transformar_listings(listings), len(listings))
+        reviews_t = self.medir("transformar_reviews", lambda: transformador.transformar_reviews(reviews), len(reviews))
+        calendar_t = self.medir("transformar_calendar", lambda: transformador.transformar_calendar(calendar), len(calendar))
+        self.medir("resumir_calendar", lambda: transformador.resumir_calendar(calendar_t), len(calendar_t))
+        self.medir_validacion(calendar_t)
+        self.medir(f"transformar_calendar_x{self.procesos}",
+                   lambda: transformador.transformar_paralelo(calendar, "calendar", procesos=self.procesos),
+                   len(calendar), repeticiones=1)
+
+        self.medir_carga("listings", listings_t)
+        self.medir_carga("reviews", reviews_t)
+        self.medir_carga("calendar", calendar_t)
+        return self.resultados
+
+    def medir_extraccion(self, calendar):
+        if mongomock is None:
+            print("   extraccion               (omitida: mongomock no está instalado)")
+            return
+
+        documentos = calendar.head(self.max_documentos_mongo).to_dict("records")
+        extractor = Extraccion("mongodb://localhost:27017/", "MX_DB", nombre_archivo="benchmark_log.txt")
+        extractor.db = mongomock.MongoClient()["MX_DB"]
+        extractor.db["MX_calendar"].insert_many(documentos)
+
+        self.medir(
+            "extraccion_calendar",
+            lambda: sum(len(lote) for lote in extractor.iterar_lotes("MX_calendar", tamano_lote=self.tamano_lote)),
+            len(documentos),
+            repeticiones=1,
+        )
+
+    def medir_validacion(self, calendar_t):
+        # Por lotes, como en el pipeline: con perfil completo y con el 10 % de los lotes
+        lotes = [calendar_t.iloc[i:i + self.tamano_lote] for i in range(0, len(calendar_t), self.tamano_lote)]
+        for nombre, fraccion in [("validar_calendar", 1.0), ("validar_calendar_p10", 0.1)]:
+            validacion = Validacion(fraccion_perfil=fraccion, nombre_archivo_log="benchmark_log.txt")
+            self.medir(nombre, lambda: [validacion.validar(lote, "calendar") for lote in lotes], len(calendar_t))
+
+    def medir_carga(self, nombre_tabla, df):
+        cargador = Carga("sqlite", ":memory:", "", "", nombre_archivo_log="benchmark_log.txt")
+
+        def cargar():
+            cargador.conexion = sqlite3.connect(":memory:")
+            columnas = ", ".join([f'"{col}"' for col in df.columns])
+            cargador.conexion.execute(f"CREATE TABLE {nombre_tabla} ({columnas})")
+            cargador.insertar_lotes(CursorSqlite(cargador.conexion), df, nombre_tabla, self.tamano_lote)
+            cargador.conexion.close()
+
+        self.medir(f"carga_{nombre_tabla}", cargar, len(df), repeticiones=1)
+
+    # ------------------------------------------
+    # BASELINE
+    # ------------------------------------------
+    def ruta_baseline(self):
+        return os.path.join(CARPETA_BENCHMARKS, f"baseline_{self.tamano}.json")
+
+    def guardar_baseline(self):
+        os.makedirs(CARPETA_BENCHMARKS, exist_ok=True)
+        datos = {
+            "tamano": self.tamano,
+            "filas_calendar": self.filas_calendar,
+            "fecha": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "maquina": platform.platform(),
+            "resultados": self.resultados,
+        }
+        with open(self.ruta_baseline(), "w", encoding="utf-8") as archivo:
+            json.dump(datos, archivo, indent=2)
+        print(f"\n💾 Baseline guardado en {self.ruta_baseline()}")
+
+    def comparar_baseline(self, tolerancia=0.2):
+        """
+        Compara con el baseline guardado; una etapa es regresión si tarda
+        más de (1 + tolerancia) veces lo registrado.
+        """
+        try:
+            with open(self.ruta_baseline(), "r", encoding="utf-8") as archivo:
+                baseline = json.load(archivo)["resultados"]
+        except FileNotFoundError:
+            print(f"\nℹ️ No hay baseline en {self.ruta_baseline()}; usa --guardar-baseline")
+            return True
+
+        print(f"\n📊 COMPARACIÓN CON BASELINE (tolerancia {tolerancia:.0%})")
+        sin_regresiones = True
+        for nombre, actual in self.resultados.items():
+            anterior = baseline.get(nombre)
+            if not anterior or not anterior["segundos"]:
+                continue
+            relacion = actual["segundos"] / anterior["segundos"]
+            regresion = relacion > 1 + tolerancia
+            sin_regresiones &= not regresion
+            estado = "❌ REGRESIÓN" if regresion else "✅"
+            print(f"   {nombre:<24} {anterior['segundos']:>9.3f}s → {actual['segundos']:>9.3f}s ({relacion:.2f}x) {estado}")
+        return sin_regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del ETL Airbnb con datos sintéticos")
+    parser.add_argument("--tamano", choices=list(TAMANOS), default="pequeno")
+    parser.add_argument("--tamano-lote", type=int, default=10000)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos para la transformación en paralelo")
+    parser.add_argument("--guardar-baseline", action="store_true")
+    parser.add_argument("--tolerancia", type=float, default=0.2)
+    args = parser.parse_args()
+
+    benchmark = BenchmarkETL(args.tamano, args.tamano_lote, args.repeticiones, procesos=args.procesos)
+    benchmark.ejecutar()
+    if args.guardar_baseline:
+        benchmark.guardar_baseline()
+        return
+    if not benchmark.comparar_baseline(args.tolerancia):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
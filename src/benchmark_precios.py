@@ -0,0 +1,60 @@
+"""
+Micro-benchmark de la limpieza de precios.
+Compara la limpieza anterior (astype(str) + regex por celda) con
+Transformacion.limpiar_precio sobre precios sintéticos con formato de calendar.
+"""
+
+import time
+import numpy as np
+import pandas as pd
+from transformacion import Transformacion
+
+
+def limpiar_precio_anterior(serie):
+    return (
+        serie.astype(str)
+        .str.replace("[^0-9.]", "", regex=True)
+        .replace("", np.nan)
+        .astype(float)
+    )
+
+
+def generar_precios(filas, precios_distintos=2000, semilla=42):
+    rng = np.random.default_rng(semilla)
+    base = rng.integers(200, 20000, size=precios_distintos)
+    textos = np.array([f"${valor:,.2f}" for valor in base], dtype=object)
+    serie = pd.Series(textos[rng.integers(0, precios_distintos, size=filas)], dtype=object)
+    serie[rng.random(filas) < 0.01] = None
+    return serie
+
+
+def medir(funcion, serie, repeticiones=3):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion(serie)
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos), resultado
+
+
+def main():
+    transformador = Transformacion(nombre_archivo_log="benchmark_log.txt")
+
+    print("=" * 70)
+    print("⏱️  BENCHMARK: LIMPIEZA DE PRECIOS")
+    print("=" * 70)
+
+    for filas in [100_000, 1_000_000]:
+        serie = generar_precios(filas)
+        t_anterior, r_anterior = medir(limpiar_precio_anterior, serie)
+        t_nuevo, r_nuevo = medir(transformador.limpiar_precio, serie)
+
+        iguales = np.allclose(r_anterior.to_numpy(), r_nuevo.to_numpy(), equal_nan=True)
+        print(f"\n🔢 {filas:,} filas")
+        print(f"   Anterior: {t_anterior:.3f}s")
+        print(f"   Nuevo:    {t_nuevo:.3f}s")
+        print(f"   Mejora:   {t_anterior / t_nuevo:.1f}x | Resultados iguales: {iguales}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Micro-benchmark de las características de texto de reviews.
+Compara la ruta anterior (fillna + strip + apply(len) por fila), la misma
+lista de características calculada fila por fila con apply y
+Transformacion.caracteristicas_texto sobre comentarios sintéticos.
+"""
+
+import re
+import time
+import numpy as np
+import pandas as pd
+from datos_sinteticos import GeneradorDatos
+from transformacion import Transformacion
+
+
+BR = re.compile(r"(?i)<br\s*/?>")
+NO_LATINO = re.compile(r"[぀-ヿ一-鿿가-힯Ѐ-ӿ؀-ۿ]")
+
+
+def longitud_anterior(serie):
+    comentarios = serie.fillna("").astype(str).str.strip()
+    return comentarios.apply(len)
+
+
+def caracteristicas_por_fila(serie):
+    texto = serie.fillna("").astype(str).apply(lambda valor: BR.sub(" ", valor).strip())
+    return pd.DataFrame({
+        "texto": texto,
+        "longitud": texto.apply(len),
+        "palabras": texto.apply(lambda valor: len(valor.split())),
+        "no_latino": texto.apply(lambda valor: NO_LATINO.search(valor) is not None),
+        "hash": texto.apply(lambda valor: hash(" ".join(valor.lower().split()))),
+    })
+
+
+def generar_comentarios(filas, semilla=42):
+    generador = GeneradorDatos(semilla)
+    return generador.generar_reviews(filas, np.arange(1, 1001))["comments"]
+
+
+def medir(funcion, serie, repeticiones=3):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion(serie)
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos), resultado
+
+
+def main():
+    transformador = Transformacion(nombre_archivo_log="benchmark_log.txt")
+
+    print("=" * 70)
+    print("⏱️  BENCHMARK: CARACTERÍSTICAS DE TEXTO DE REVIEWS")
+    print("=" * 70)
+
+    for filas in [100_000, 1_000_000]:
+        serie = generar_comentarios(filas)
+        t_anterior, _ = medir(longitud_anterior, serie)
+        t_fila, r_fila = medir(caracteristicas_por_fila, serie)
+        t_nuevo, r_nuevo = medir(transformador.caracteristicas_texto, serie)
+
+        iguales = (np.array_equal(r_fila["longitud"].to_numpy(), r_nuevo["longitud"].to_numpy())
+                   and np.array_equal(r_fila["palabras"].to_numpy(), r_nuevo["palabras"].to_numpy()))
+        print(f"\n💬 {filas:,} comentarios")
+        print(f"   apply(len) (solo longitud):     {t_anterior:.3f}s")
+        print(f"   apply por fila (5 columnas):    {t_fila:.3f}s")
+        print(f"   caracteristicas_texto (5 col.): {t_nuevo:.3f}s")
+        print(f"   Mejora frente a apply por fila: {t_fila / t_nuevo:.1f}x | Longitud y palabras iguales: {iguales}")
+
+
+if __name__ == "__main__":
+    main()
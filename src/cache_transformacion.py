@@ -0,0 +1,281 @@
+"""
+Caché en disco de resultados de Transformacion.
+
+Cada fila de origen se identifica con un hash estable de todo su contenido
+(incluido el _id). Las filas transformadas se guardan en segmentos Parquet
+junto con ese hash; en la siguiente ejecución las filas cuyo hash ya está
+en el caché se leen de los segmentos y solo las nuevas o modificadas pasan
+por transformar_listings/reviews/calendar. El tamaño total se limita
+borrando los segmentos usados hace más tiempo (LRU).
+"""
+
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from bson import ObjectId
+
+from instrumentacion import instrumentacion
+
+
+# Cambiar al modificar las transformaciones: invalida todo lo guardado
+VERSION_TRANSFORMACION = "3"
+COLUMNA_HASH = "__hash_fuente"
+
+
+def hash_filas(df):
+    """
+    Hash uint64 por fila que no depende del índice. Los ObjectId se hashean
+    por sus 12 bytes y las demás columnas de objetos que no son texto
+    (listas o diccionarios de MongoDB) por su representación en texto.
+    Los nombres de las columnas entran en el hash: la misma fila con otro
+    conjunto de campos es otra entrada del caché.
+    """
+    hashes = {}
+    for i, col in enumerate(df.columns):
+        serie = df[col]
+        if serie.dtype == object and pd.api.types.infer_dtype(serie, skipna=True) != "string":
+            hashes[i] = hash_objetos(serie)
+        else:
+            hashes[i] = pd.util.hash_pandas_object(serie, index=False).to_numpy()
+    firma = pd.util.hash_array(np.array(["\x1f".join(map(str, df.columns))], dtype=object))[0]
+    hashes[len(df.columns)] = np.full(len(df), firma, dtype=np.uint64)
+    return pd.util.hash_pandas_object(pd.DataFrame(hashes), index=False).to_numpy()
+
+
+def hash_objetos(serie):
+    if serie.notna().all() and all(isinstance(valor, ObjectId) for valor in serie.iloc[:100]):
+        try:
+            # 12 bytes = 8 + 4: se combinan como dos enteros sin pasar a texto
+            binarios = np.frombuffer(b"".join([valor.binary for valor in serie]), dtype=np.uint8).reshape(-1, 12)
+            alto = binarios[:, :8].copy().view(np.uint64).ravel()
+            bajo = binarios[:, 8:].copy().view(np.uint32).ravel().astype(np.uint64)
+            return pd.util.hash_array(alto ^ (bajo * np.uint64(0x9E3779B97F4A7C15)), categorize=False)
+        except AttributeError:
+            pass
+    return pd.util.hash_pandas_object(serie.astype(str), index=False, categorize=False).to_numpy()
+
+
+class CacheTransformacion:
+    def __init__(self, carpeta="Cache", maximo_mb=512):
+        ruta_base = os.path.dirname(os.path.abspath(__file__))
+        self.carpeta = os.path.join(ruta_base, carpeta, "transformacion")
+        self.maximo_bytes = int(maximo_mb * 1024 * 1024)
+        self.candado = threading.Lock()
+        self.aciertos = {}
+        self.fallos = {}
+        self.tipos = {}
+        self.contador = 0
+
+    # ------------------------------------------
+    # TRANSFORMACIÓN CON CACHÉ
+    # ------------------------------------------
+    def transformar(self, df, tipo, transformador):
+        """
+        Transforma `df` con `transformador` (Transformacion) usando el caché.
+        El resultado tiene las mismas filas y el mismo orden que
+        transformador.transformar(df, tipo); como en transformar_paralelo,
+        las columnas que Arrow no conoce (ObjectId) salen como texto.
+        """
+        if df.empty:
+            return transformador.transformar(df, tipo)
+
+        # Los duplicados se quitan antes de buscar en el caché, igual que
+        # lo haría la transformación
+        claves = [col for col in transformador.CLAVES_DUPLICADOS[tipo] if col in df.columns]
+        if len(claves) == len(transformador.CLAVES_DUPLICADOS[tipo]):
+            df = df.drop_duplicates(subset=claves)
+
+        indice_original = df.index
+        df = df.reset_index(drop=True)
+        # Los lotes de Mongo no traen los campos siempre en el mismo orden:
+        # el hash usa el orden alfabético de las columnas
+        hashes = hash_filas(df[sorted(df.columns)])
+
+        with instrumentacion.etapa("cache_transformacion", tipo) as datos:
+            estado = self.abrir(tipo)
+            with self.candado:
+                segmentos = estado["indice"].reindex(hashes).to_numpy()
+            acierto = pd.notna(segmentos)
+            partes, perdidas = self.leer_aciertos(tipo, hashes[acierto], segmentos[acierto], np.flatnonzero(acierto))
+            acierto[perdidas] = False
+
+            fallos = np.flatnonzero(~acierto)
+            if len(fallos):
+                nuevos = transformador.transformar(df.iloc[fallos], tipo)
+                nuevos = transformador.preparar_para_arrow(nuevos)
+                self.guardar_segmento(tipo, nuevos, pd.Series(hashes, index=df.index).loc[nuevos.index].to_numpy())
+                partes.append(nuevos)
+
+            datos["filas"] = len(df)
+            datos["bytes"] = df.memory_usage(index=False).sum()
+            self.contar(tipo, int(acierto.sum()), len(fallos))
+
+        partes = [parte for parte in partes if not parte.empty]
+        if not partes:
+            return pd.DataFrame()
+        resultado = transformador.unir_partes(partes)
+        resultado.index = indice_original[resultado.index]
+        return resultado
+
+    def leer_aciertos(self, tipo, hashes, segmentos, posiciones):
+        """
+        Lee de cada segmento las filas de `hashes` y les pone como índice su
+        posición en el lote. Devuelve también las posiciones de segmentos
+        que ya no existen, para transformarlas como fallos.
+        """
+        partes = []
+        perdidas = []
+        for segmento in pd.unique(segmentos):
+            del_segmento = segmentos == segmento
+            try:
+                tabla = pq.read_table(os.path.join(self.carpeta, tipo, segmento), memory_map=True).to_pandas()
+            except (FileNotFoundError, OSError):
+                # Desalojado por otro hilo entre la búsqueda y la lectura
+                perdidas.extend(posiciones[del_segmento])
+                continue
+            fila_por_hash = pd.Series(np.arange(len(tabla)), index=tabla[COLUMNA_HASH].to_numpy())
+            fila_por_hash = fila_por_hash[~fila_por_hash.index.duplicated(keep="last")]
+            parte = tabla.iloc[fila_por_hash.loc[hashes[del_segmento]].to_numpy()].drop(columns=[COLUMNA_HASH])
+            parte.index = posiciones[del_segmento]
+            partes.append(parte)
+            self.usar_segmento(tipo, segmento)
+        return partes, np.array(perdidas, dtype=np.int64)
+
+    # ------------------------------------------
+    # ÍNDICE Y SEGMENTOS
+    # ------------------------------------------
+    def abrir(self, tipo):
+        """
+        Carga (una vez por proceso) el índice hash -> segmento de `tipo`
+        leyendo solo la columna de hash de cada segmento. Si cambió la
+        versión de las transformaciones, el caché de ese tipo se vacía; los
+        lotes con distintas columnas conviven porque el hash las incluye.
+        """
+        with self.candado:
+            estado = self.tipos.get(tipo)
+            if estado is not None:
+                return estado
+
+            carpeta = os.path.join(self.carpeta, tipo)
+            os.makedirs(carpeta, exist_ok=True)
+            metadatos = self.leer_metadatos(tipo)
+            if metadatos.get("version") != VERSION_TRANSFORMACION:
+                for segmento in metadatos.get("segmentos", {}):
+                    self.borrar_archivo(os.path.join(carpeta, segmento))
+                metadatos = {"version": VERSION_TRANSFORMACION, "segmentos": {}}
+
+            partes = []
+            for segmento in list(metadatos["segmentos"]):
+                try:
+                    hashes = pq.read_table(os.path.join(carpeta, segmento), columns=[COLUMNA_HASH])[COLUMNA_HASH]
+                except (FileNotFoundError, OSError):
+                    del metadatos["segmentos"][segmento]
+                    continue
+                partes.append(pd.Series(segmento, index=hashes.to_numpy(), dtype=object))
+            indice = pd.concat(partes) if partes else pd.Series(dtype=object, index=pd.Index([], dtype=np.uint64))
+            indice = indice[~indice.index.duplicated(keep="last")]
+
+            estado = {"metadatos": metadatos, "indice": indice}
+            self.tipos[tipo] = estado
+            self.escribir_metadatos(tipo)
+            return estado
+
+    def guardar_segmento(self, tipo, df, hashes):
+        with self.candado:
+            self.contador += 1
+            segmento = f"{time.time_ns()}_{os.getpid()}_{self.contador}.parquet"
+        ruta = os.path.join(self.carpeta, tipo, segmento)
+
+        tabla = pa.Table.from_pandas(df.assign(**{COLUMNA_HASH: hashes}), preserve_index=False)
+        pq.write_table(tabla, ruta, compression="zstd", use_dictionary=True)
+
+        with self.candado:
+            estado = self.tipos[tipo]
+            estado["metadatos"]["segmentos"][segmento] = {
+                "bytes": os.path.getsize(ruta), "filas": len(df), "ultimo_uso": time.time(),
+            }
+            nuevos = pd.Series(segmento, index=hashes, dtype=object)
+            indice = pd.concat([estado["indice"], nuevos])
+            estado["indice"] = indice[~indice.index.duplicated(keep="last")]
+            self.desalojar(tipo)
+            self.escribir_metadatos(tipo)
+
+    def usar_segmento(self, tipo, segmento):
+        # El último uso se guarda en disco con la siguiente escritura
+        with self.candado:
+            datos = self.tipos[tipo]["metadatos"]["segmentos"].get(segmento)
+            if datos is not None:
+                datos["ultimo_uso"] = time.time()
+
+    def desalojar(self, tipo):
+        # LRU sobre todos los tipos: se borran los segmentos usados hace más
+        # tiempo hasta quedar bajo el máximo (se llama con el candado tomado)
+        segmentos = [
+            (datos["ultimo_uso"], nombre_tipo, segmento, datos["bytes"])
+            for nombre_tipo, estado in self.tipos.items()
+            for segmento, datos in estado["metadatos"]["segmentos"].items()
+        ]
+        total = sum(bytes_ for _, _, _, bytes_ in segmentos)
+        for _, nombre_tipo, segmento, bytes_ in sorted(segmentos):
+            if total <= self.maximo_bytes:
+                break
+            estado = self.tipos[nombre_tipo]
+            del estado["metadatos"]["segmentos"][segmento]
+            estado["indice"] = estado["indice"][estado["indice"] != segmento]
+            self.borrar_archivo(os.path.join(self.carpeta, nombre_tipo, segmento))
+            total -= bytes_
+            if nombre_tipo != tipo:
+                self.escribir_metadatos(nombre_tipo)
+
+    def ruta_metadatos(self, tipo):
+        return os.path.join(self.carpeta, tipo, "segmentos.json")
+
+    def leer_metadatos(self, tipo):
+        try:
+            with open(self.ruta_metadatos(tipo), "r", encoding="utf-8") as archivo:
+                return json.load(archivo)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def escribir_metadatos(self, tipo):
+        temporal = self.ruta_metadatos(tipo) + ".tmp"
+        with open(temporal, "w", encoding="utf-8") as archivo:
+            json.dump(self.tipos[tipo]["metadatos"], archivo)
+        os.replace(temporal, self.ruta_metadatos(tipo))
+
+    def borrar_archivo(self, ruta):
+        try:
+            os.remove(ruta)
+        except FileNotFoundError:
+            pass
+
+    # ------------------------------------------
+    # ESTADÍSTICAS
+    # ------------------------------------------
+    def contar(self, tipo, aciertos, fallos):
+        with self.candado:
+            self.aciertos[tipo] = self.aciertos.get(tipo, 0) + aciertos
+            self.fallos[tipo] = self.fallos.get(tipo, 0) + fallos
+
+    def estadisticas(self):
+        """
+        Devuelve {tipo: {"aciertos", "fallos", "tasa_aciertos"}} acumulado
+        desde que se creó el caché.
+        """
+        with self.candado:
+            resultado = {}
+            for tipo in sorted(set(self.aciertos) | set(self.fallos)):
+                aciertos, fallos = self.aciertos.get(tipo, 0), self.fallos.get(tipo, 0)
+                total = aciertos + fallos
+                resultado[tipo] = {
+                    "aciertos": aciertos,
+                    "fallos": fallos,
+                    "tasa_aciertos": round(aciertos / total, 4) if total else None,
+                }
+            return resultado
@@ -1,15 +1,45 @@
 import pandas as pd
+import numpy as np
 import os
-import pyodbc
+import time
+import threading
+import pyarrow.parquet as pq
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from openpyxl import Workbook
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from conexiones import obtener_pool_sqlserver
+from instrumentacion import escritor_log, instrumentacion
+
+# Límite de filas de una hoja de Excel (incluye la fila de encabezados)
+MAX_FILAS_EXCEL = 1_048_576
 
 class Carga:
-    def __init__(self, servidor, base_datos, usuario, password, nombre_archivo_log="logs_carga.txt"):
+    # Claves naturales usadas por el modo MERGE
+    CLAVES_NATURALES = {
+        "listings": ["_id"],
+        "reviews": ["_id"],
+        "calendar": ["listing_id", "date"],
+        "calendar_mensual": ["listing_id", "mes"],
+        # Esquema estrella (estrella.ModeloEstrella)
+        "dim_host": ["host_sk"],
+        "dim_neighbourhood": ["neighbourhood_sk"],
+        "dim_room_type": ["room_type_sk"],
+        "dim_listing": ["listing_sk"],
+        "dim_date": ["date_sk"],
+        "fact_calendar": ["listing_sk", "date_sk"],
+        "fact_reviews": ["_id"],
+    }
+
+    def __init__(self, servidor, base_datos, usuario, password, nombre_archivo_log="logs_carga.txt",
+                 tamano_pool=8):
         self.servidor = servidor
         self.base_datos = base_datos
         self.usuario = usuario
         self.password = password
+        self.tamano_pool = tamano_pool
         self.conexion = None
+        self.pool = None
 
         ruta_base = os.path.dirname(os.path.abspath(__file__))
         carpeta_logs = os.path.join(ruta_base, "Logs")
@@ -21,13 +51,17 @@ class Carga:
     # ---------------------------------------
     def conectar_sqlserver(self):
         try:
-            self.conexion = pyodbc.connect(
+            # La conexión sale de un pool compartido por proceso, así los
+            # cargadores en paralelo no pagan el login en cada lote
+            cadena = (
                 f"DRIVER={{SQL Server}};"
                 f"SERVER={self.servidor};"
                 f"DATABASE={self.base_datos};"
                 f"UID={self.usuario};"
                 f"PWD={self.password}"
             )
+            self.pool = obtener_pool_sqlserver(cadena, self.tamano_pool)
+            self.conexion = self.pool.tomar()
             self.registrar_log("Conexión a SQL Server", True)
             return True
         except Exception as e:
@@ -35,28 +69,51 @@ class Carga:
             self.registrar_log(f"Error de conexión: {e}", False)
             return False
 
+    # ---------------------------------------
+    # 1️⃣.1 Lectura del artefacto Parquet de Transformacion
+    # ---------------------------------------
+    def leer_parquet(self, ruta: str, columnas: list = None):
+        # memory_map evita copiar el archivo a memoria antes de decodificarlo
+        tabla = pq.read_table(ruta, columns=columnas, memory_map=True)
+        return tabla.to_pandas()
+
+    def iterar_parquet(self, ruta: str, columnas: list = None):
+        """
+        Recorre el archivo grupo de filas por grupo de filas, leyendo solo
+        `columnas`, para cargar sin tener todo el archivo en memoria.
+        """
+        archivo = pq.ParquetFile(ruta, memory_map=True)
+        for i in range(archivo.num_row_groups):
+            yield archivo.read_row_group(i, columns=columnas).to_pandas()
+
     # ---------------------------------------
     # 2️⃣ Carga de DataFrames a SQL Server
     # ---------------------------------------
-    def cargar_a_sqlserver(self, df: pd.DataFrame, nombre_tabla: str):
+    def cargar_a_sqlserver(self, df: pd.DataFrame, nombre_tabla: str, tamano_lote: int = 10000,
+                           columnas_indice: list = None, tipo_indice: str = "clustered",
+                           modo: str = "reemplazar", claves: list = None):
         if self.conexion is None:
             print("❌ No hay conexión activa con SQL Server")
             return False
 
+        if modo == "merge":
+            return self.cargar_con_merge(df, nombre_tabla, claves, tamano_lote)
+
         cursor = self.conexion.cursor()
         try:
-            # Crear tabla dinámica según columnas del DataFrame
-            columnas = ", ".join([f"[{col}] NVARCHAR(MAX)" for col in df.columns])
+            # Crear tabla con tipos inferidos de las columnas del DataFrame
+            columnas = self.definir_columnas(df)
             sql_crear = f"IF OBJECT_ID('{nombre_tabla}', 'U') IS NOT NULL DROP TABLE {nombre_tabla}; CREATE TABLE {nombre_tabla} ({columnas});"
             cursor.execute(sql_crear)
+            self.conexion.commit()
 
-            # Insertar filas
-            for _, fila in df.iterrows():
-                valores = [str(x) if x is not None else None for x in fila]
-                placeholders = ", ".join(["?" for _ in valores])
-                cursor.execute(f"INSERT INTO {nombre_tabla} VALUES ({placeholders})", valores)
+            # Insertar filas por lotes
+            self.insertar_lotes(cursor, df, nombre_tabla, tamano_lote)
+
+            # El índice se crea después de la carga para no frenar la inserción
+            if columnas_indice:
+                self.crear_indice(nombre_tabla, columnas_indice, tipo_indice)
 
-            self.conexion.commit()
             print(f"✅ Datos cargados en tabla '{nombre_tabla}' ({len(df)} registros)")
             self.registrar_log(f"Carga tabla {nombre_tabla}", True)
             return True
@@ -65,6 +122,318 @@ class Carga:
             self.registrar_log(f"Error carga {nombre_tabla}: {e}", False)
             return False
 
+    # ---------------------------------------
+    # 2️⃣.1 Carga incremental (append / upsert)
+    # ---------------------------------------
+    def cargar_incremental(self, df: pd.DataFrame, nombre_tabla: str, claves: list = None,
+                           tamano_lote: int = 10000, solo_agregar: bool = False):
+        """
+        Agrega el delta de una extracción incremental sin borrar la tabla.
+        Primero elimina las filas existentes con las mismas `claves` (por
+        defecto las de CLAVES_NATURALES), de modo que las filas que se
+        vuelven a leer se reemplazan (upsert). Con `solo_agregar` no borra
+        nada: para tablas que se vaciaron antes de la carga.
+        """
+        if self.conexion is None:
+            print("❌ No hay conexión activa con SQL Server")
+            return False
+        if df.empty:
+            print(f"ℹ️ Sin registros nuevos para '{nombre_tabla}'")
+            return True
+
+        claves = claves or self.CLAVES_NATURALES.get(nombre_tabla)
+        cursor = self.conexion.cursor()
+        try:
+            columnas = self.definir_columnas(df, claves, texto_fijo=True)
+            self.crear_tabla(cursor, nombre_tabla, columnas, claves)
+
+            if claves and not solo_agregar:
+                condicion = " AND ".join([f"[{col}] = ?" for col in claves])
+                valores_claves = self.preparar_parametros(df[claves].drop_duplicates())
+                cursor.fast_executemany = True
+                cursor.executemany(f"DELETE FROM {nombre_tabla} WHERE {condicion}", valores_claves)
+
+            # El borrado y la inserción se confirman juntos al final
+            self.insertar_lotes(cursor, df, nombre_tabla, tamano_lote, confirmar_por_lote=False)
+            self.conexion.commit()
+            print(f"✅ Delta cargado en tabla '{nombre_tabla}' ({len(df)} registros)")
+            self.registrar_log(f"Carga incremental tabla {nombre_tabla}", True)
+            return True
+        except Exception as e:
+            self.conexion.rollback()
+            print(f"❌ Error al cargar {nombre_tabla}: {e}")
+            self.registrar_log(f"Error carga incremental {nombre_tabla}: {e}", False)
+            return False
+
+    # ---------------------------------------
+    # 2️⃣.2 Inserción masiva por lotes
+    # ---------------------------------------
+    def insertar_lotes(self, cursor, df: pd.DataFrame, nombre_tabla: str, tamano_lote: int = 10000,
+                       confirmar_por_lote: bool = True):
+        """
+        Inserta el DataFrame con `fast_executemany` en lotes de `tamano_lote`
+        filas, confirmando cada lote, y reporta filas por segundo.
+        """
+        cursor.fast_executemany = True
+        nombres = ", ".join([f"[{col}]" for col in df.columns])
+        placeholders = ", ".join(["?" for _ in df.columns])
+        sql_insertar = f"INSERT INTO {nombre_tabla} ({nombres}) VALUES ({placeholders})"
+
+        inicio = time.perf_counter()
+        for desde in range(0, len(df), tamano_lote):
+            lote = df.iloc[desde:desde + tamano_lote]
+            with instrumentacion.etapa("carga", nombre_tabla) as datos:
+                cursor.executemany(sql_insertar, self.preparar_parametros(lote))
+                if confirmar_por_lote:
+                    self.conexion.commit()
+                datos["filas"] = len(lote)
+                datos["bytes"] = lote.memory_usage(index=False).sum()
+
+        duracion = time.perf_counter() - inicio
+        filas_por_segundo = len(df) / duracion if duracion > 0 else 0
+        print(f"⏱️ {len(df)} filas en {duracion:.2f}s ({filas_por_segundo:,.0f} filas/s)")
+        self.registrar_log(f"Inserción {nombre_tabla}: {len(df)} filas, {filas_por_segundo:.0f} filas/s", True)
+        return len(df)
+
+    def preparar_parametros(self, df: pd.DataFrame):
+        # Conversión por columnas: números, booleanos y fechas se pasan como
+        # valores nativos, el resto como texto, y los nulos quedan como None,
+        # sin crear una Series por fila.
+        columnas = []
+        for col in df.columns:
+            serie = self.quitar_categoria(df[col])
+            if pd.api.types.is_datetime64_any_dtype(serie):
+                valores = np.array(serie.dt.to_pydatetime(), dtype=object)
+            elif (pd.api.types.is_bool_dtype(serie) or pd.api.types.is_numeric_dtype(serie)
+                  or self.tipo_objeto(serie) in ("boolean", "integer", "floating")):
+                valores = np.array(serie.astype(object), dtype=object)
+            else:
+                valores = np.array(serie.astype(str), dtype=object)
+            valores[serie.isna().to_numpy()] = None
+            columnas.append(valores)
+        return list(zip(*columnas))
+
+    # ---------------------------------------
+    # 2️⃣.3 Esquema tipado e índices
+    # ---------------------------------------
+    def inferir_esquema(self, df: pd.DataFrame, claves: list = None, texto_fijo: bool = False):
+        """
+        Traduce los dtypes de Transformacion a tipos nativos de SQL Server:
+        enteros → BIGINT, precios → DECIMAL, otros float → FLOAT,
+        booleanos → BIT, fechas → DATE o DATETIME2 y texto → NVARCHAR
+        dimensionado según la longitud máxima observada.
+
+        Con `texto_fijo` (tablas a las que se agregan lotes o se les hace
+        MERGE) el texto no se dimensiona con el lote que crea la tabla,
+        porque los siguientes pueden traer valores más largos: las columnas
+        de `claves` van a NVARCHAR(450), el máximo que admite la clave de un
+        índice, y el resto a NVARCHAR(MAX).
+        """
+        claves = set(claves or [])
+        esquema = {}
+        for col in df.columns:
+            serie = self.quitar_categoria(df[col])
+            tipo_objeto = self.tipo_objeto(serie)
+            if pd.api.types.is_bool_dtype(serie) or tipo_objeto == "boolean":
+                esquema[col] = "BIT"
+            elif pd.api.types.is_integer_dtype(serie) or tipo_objeto == "integer":
+                esquema[col] = "BIGINT"
+            elif pd.api.types.is_float_dtype(serie) or tipo_objeto == "floating":
+                esquema[col] = "DECIMAL(18, 2)" if "price" in str(col).lower() else "FLOAT"
+            elif pd.api.types.is_datetime64_any_dtype(serie):
+                fechas = serie.dropna()
+                solo_fecha = not fechas.empty and (fechas == fechas.dt.normalize()).all()
+                esquema[col] = "DATE" if solo_fecha else "DATETIME2"
+            elif texto_fijo:
+                esquema[col] = "NVARCHAR(450)" if col in claves else "NVARCHAR(MAX)"
+            else:
+                esquema[col] = self.dimensionar_texto(serie)
+        return esquema
+
+    def quitar_categoria(self, serie: pd.Series):
+        # Las columnas `category` de Transformacion se cargan con el tipo
+        # de sus categorías (texto, fechas, etc.).
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            return serie.astype(serie.cat.categories.dtype)
+        return serie
+
+    def tipo_objeto(self, serie: pd.Series):
+        # Columnas object con valores homogéneos, p. ej. `available` tras
+        # el map a True/False con nulos.
+        if serie.dtype != object:
+            return None
+        return pd.api.types.infer_dtype(serie, skipna=True)
+
+    def dimensionar_texto(self, serie: pd.Series):
+        # Solo para tablas que se crean de una vez con todos sus datos; se
+        # redondea a la siguiente potencia de 2 (mínimo 16). NVARCHAR cuenta
+        # unidades UTF-16: un emoji ocupa dos.
+        valores = serie.dropna()
+        longitud = int(valores.astype(str).str.encode("utf-16-le").str.len().max()) // 2 if not valores.empty else 0
+        if longitud > 4000:
+            return "NVARCHAR(MAX)"
+        tamano = 16
+        while tamano < longitud:
+            tamano *= 2
+        return f"NVARCHAR({min(tamano, 4000)})"
+
+    def definir_columnas(self, df: pd.DataFrame, claves: list = None, texto_fijo: bool = False):
+        esquema = self.inferir_esquema(df, claves, texto_fijo)
+        return ", ".join([f"[{col}] {tipo}" for col, tipo in esquema.items()])
+
+    def crear_tabla(self, cursor, nombre_tabla: str, columnas: str, claves: list = None):
+        """
+        Crea la tabla si no existe y, al crearla, su índice clustered sobre
+        `claves`: sin él cada MERGE o DELETE por clave recorre la tabla
+        entera y una carga por lotes se vuelve cuadrática.
+        """
+        cursor.execute(f"SELECT OBJECT_ID('{nombre_tabla}', 'U')")
+        if cursor.fetchone()[0] is not None:
+            return False
+        cursor.execute(f"CREATE TABLE {nombre_tabla} ({columnas});")
+        self.conexion.commit()
+        if claves and not self.crear_indice(nombre_tabla, claves):
+            raise RuntimeError(f"no se pudo crear el índice de {nombre_tabla}")
+        return True
+
+    def crear_indice(self, nombre_tabla: str, columnas: list, tipo: str = "clustered"):
+        """
+        Crea un índice clustered sobre `columnas` (p. ej. calendar(listing_id, date))
+        o, con tipo="columnstore", un índice clustered columnstore sobre la tabla.
+        """
+        if self.conexion is None:
+            print("❌ No hay conexión activa con SQL Server")
+            return False
+        try:
+            cursor = self.conexion.cursor()
+            if tipo == "columnstore":
+                cursor.execute(f"CREATE CLUSTERED COLUMNSTORE INDEX cci_{nombre_tabla} ON {nombre_tabla}")
+            else:
+                nombres = ", ".join([f"[{col}]" for col in columnas])
+                cursor.execute(f"CREATE CLUSTERED INDEX ix_{nombre_tabla}_{'_'.join(columnas)} ON {nombre_tabla} ({nombres})")
+            self.conexion.commit()
+            self.registrar_log(f"Índice {tipo} en {nombre_tabla}", True)
+            return True
+        except Exception as e:
+            print(f"❌ Error al crear índice en {nombre_tabla}: {e}")
+            self.registrar_log(f"Error índice {nombre_tabla}: {e}", False)
+            return False
+
+    # ---------------------------------------
+    # 2️⃣.4 Carga idempotente con staging + MERGE
+    # ---------------------------------------
+    def cargar_con_merge(self, df: pd.DataFrame, nombre_tabla: str, claves: list = None,
+                         tamano_lote: int = 10000, columnas_ignoradas: tuple = ("fecha_transformacion",)):
+        """
+        Carga el DataFrame en una tabla temporal de staging y luego hace un
+        MERGE sobre la tabla destino usando las claves naturales. Solo se
+        actualizan las filas cuyo contenido cambió (sin contar
+        `columnas_ignoradas`) y se insertan las nuevas; la tabla destino
+        nunca se borra, así que los lectores no la ven desaparecer.
+        """
+        if self.conexion is None:
+            print("❌ No hay conexión activa con SQL Server")
+            return False
+
+        claves = claves or self.CLAVES_NATURALES.get(nombre_tabla)
+        if not claves:
+            print(f"❌ No hay claves definidas para el MERGE de '{nombre_tabla}'")
+            return False
+
+        staging = f"#stg_{nombre_tabla}"
+        cursor = self.conexion.cursor()
+        try:
+            columnas = self.definir_columnas(df, claves, texto_fijo=True)
+            self.crear_tabla(cursor, nombre_tabla, columnas, claves)
+            cursor.execute(f"IF OBJECT_ID('tempdb..{staging}') IS NOT NULL DROP TABLE {staging}; CREATE TABLE {staging} ({columnas});")
+            self.conexion.commit()
+
+            self.insertar_lotes(cursor, df, staging, tamano_lote)
+
+            cursor.execute(self.construir_merge(nombre_tabla, staging, list(df.columns), claves, columnas_ignoradas))
+            filas_afectadas = cursor.rowcount
+            cursor.execute(f"DROP TABLE {staging}")
+            self.conexion.commit()
+
+            print(f"✅ MERGE en tabla '{nombre_tabla}' ({filas_afectadas} filas insertadas o actualizadas)")
+            self.registrar_log(f"Merge tabla {nombre_tabla}: {filas_afectadas} filas", True)
+            return True
+        except Exception as e:
+            self.conexion.rollback()
+            print(f"❌ Error en MERGE de {nombre_tabla}: {e}")
+            self.registrar_log(f"Error merge {nombre_tabla}: {e}", False)
+            return False
+
+    def construir_merge(self, nombre_tabla: str, staging: str, columnas: list, claves: list,
+                        columnas_ignoradas: tuple = ()):
+        condicion = " AND ".join([f"destino.[{col}] = origen.[{col}]" for col in claves])
+        no_claves = [col for col in columnas if col not in claves]
+        comparables = [col for col in no_claves if col not in columnas_ignoradas]
+        nombres = ", ".join([f"[{col}]" for col in columnas])
+        valores = ", ".join([f"origen.[{col}]" for col in columnas])
+
+        sql = f"MERGE {nombre_tabla} WITH (HOLDLOCK) AS destino USING {staging} AS origen ON {condicion}"
+        if no_claves:
+            # EXCEPT compara también NULLs, a diferencia de <>
+            cambio = (
+                f" AND EXISTS (SELECT {', '.join([f'origen.[{col}]' for col in comparables])}"
+                f" EXCEPT SELECT {', '.join([f'destino.[{col}]' for col in comparables])})"
+                if comparables else ""
+            )
+            asignaciones = ", ".join([f"destino.[{col}] = origen.[{col}]" for col in no_claves])
+            sql += f" WHEN MATCHED{cambio} THEN UPDATE SET {asignaciones}"
+        sql += f" WHEN NOT MATCHED BY TARGET THEN INSERT ({nombres}) VALUES ({valores});"
+        return sql
+
+    # ---------------------------------------
+    # 2️⃣.5 Tablas de resumen (hechos agregados)
+    # ---------------------------------------
+    def cargar_resumen(self, df: pd.DataFrame, nombre_tabla: str = "calendar_mensual", modo: str = "reemplazar",
+                       tamano_lote: int = 10000):
+        """
+        Carga una tabla de resumen producida por Transformacion (p. ej.
+        resumir_calendar) con índice agrupado sobre sus claves, para que los
+        tableros consulten miles de filas en lugar del calendar completo.
+        """
+        if df.empty:
+            print(f"ℹ️ Sin resumen para cargar en '{nombre_tabla}'")
+            return True
+
+        claves = self.CLAVES_NATURALES[nombre_tabla]
+        return self.cargar_a_sqlserver(df, nombre_tabla, tamano_lote, columnas_indice=claves, modo=modo,
+                                       claves=claves)
+
+    # ---------------------------------------
+    # 2️⃣.6 Esquema estrella (dimensiones + hechos)
+    # ---------------------------------------
+    def cargar_estrella(self, df: pd.DataFrame, tipo: str, modelo, modo: str = "merge", tamano_lote: int = 10000):
+        """
+        Divide un lote transformado con `modelo` (estrella.ModeloEstrella) y
+        carga sus tablas. Las dimensiones siempre se cargan con MERGE porque
+        varios lotes repiten los mismos hosts, barrios y fechas; los hechos
+        siguen `modo` (merge o agregar a una tabla ya vaciada). El caché de
+        claves se guarda antes de cargar, para que una ejecución que falle a
+        mitad no reasigne claves ya escritas en SQL Server.
+        """
+        try:
+            tablas = modelo.dividir(df, tipo)
+        except Exception as e:
+            print(f"❌ Error al dividir {tipo} en dimensiones y hechos: {e}")
+            self.registrar_log(f"Error esquema estrella {tipo}: {e}", False)
+            return False
+        if not modelo.cache.guardar():
+            return False
+
+        exito = True
+        for nombre_tabla, tabla in tablas.items():
+            if tabla.empty:
+                continue
+            if nombre_tabla.startswith("dim_") or modo == "merge":
+                exito &= self.cargar_con_merge(tabla, nombre_tabla, tamano_lote=tamano_lote)
+            else:
+                exito &= self.cargar_incremental(tabla, nombre_tabla, tamano_lote=tamano_lote, solo_agregar=True)
+        return exito
+
     # ---------------------------------------
     # 3️⃣ Verificar cantidad de registros
     # ---------------------------------------
@@ -79,25 +448,86 @@ class Carga:
         except Exception:
             return 0
 
+    # ---------------------------------------
+    # 3️⃣.1 Eliminar tabla
+    # ---------------------------------------
+    def eliminar_tabla(self, nombre_tabla: str):
+        if self.conexion is None:
+            return False
+        try:
+            cursor = self.conexion.cursor()
+            cursor.execute(f"IF OBJECT_ID('{nombre_tabla}', 'U') IS NOT NULL DROP TABLE {nombre_tabla};")
+            self.conexion.commit()
+            self.registrar_log(f"Tabla {nombre_tabla} eliminada", True)
+            return True
+        except Exception as e:
+            print(f"❌ Error al eliminar {nombre_tabla}: {e}")
+            self.registrar_log(f"Error eliminar {nombre_tabla}: {e}", False)
+            return False
+
     # ---------------------------------------
     # 4️⃣ Exportar a Excel
     # ---------------------------------------
-    def exportar_a_excel(self, df: pd.DataFrame, ruta_salida: str):
+    def exportar_a_excel(self, df: pd.DataFrame, ruta_salida: str, filas_por_hoja: int = None,
+                         hojas_por_archivo: int = None):
+        return self.exportar_lotes_a_excel([df], ruta_salida, filas_por_hoja, hojas_por_archivo)
+
+    def exportar_lotes_a_excel(self, lotes, ruta_salida: str, filas_por_hoja: int = None,
+                               hojas_por_archivo: int = None):
+        """
+        Exporta un iterador de DataFrames (p. ej. iterar_parquet) con un
+        EscritorExcel en modo solo escritura: las filas se escriben a medida
+        que llegan y nunca está el libro completo en memoria.
+        """
+        escritor = EscritorExcel(self, ruta_salida, filas_por_hoja, hojas_por_archivo)
         try:
-            df.to_excel(ruta_salida, index=False)
-            self.registrar_log(f"Exportación Excel {ruta_salida}", True)
+            for lote in lotes:
+                escritor.escribir(lote)
+            rutas = escritor.cerrar()
+            if not rutas:
+                print(f"⚠️ Sin columnas para exportar a {ruta_salida}")
+                self.registrar_log(f"Exportación Excel {ruta_salida}: sin columnas", False)
+                return False
+            print(f"✅ {escritor.filas:,} filas exportadas a {', '.join(rutas)}")
+            self.registrar_log(f"Exportación Excel {ruta_salida}: {escritor.filas} filas, {len(rutas)} archivos", True)
             return True
         except Exception as e:
+            escritor.descartar()
             print(f"❌ Error al exportar a Excel: {e}")
             self.registrar_log(f"Error exportar Excel: {e}", False)
             return False
 
+    def exportar_tablas_a_excel(self, tablas: dict, carpeta: str, procesos: int = None,
+                                filas_por_hoja: int = None, hojas_por_archivo: int = None):
+        """
+        Exporta varias tablas {nombre: DataFrame o ruta Parquet} a
+        `carpeta`/<nombre>.xlsx, cada una en su propio proceso: openpyxl es
+        Python puro, así que los hilos no avanzarían en paralelo. Con rutas
+        Parquet cada proceso lee su archivo por grupos de filas en lugar de
+        recibir el DataFrame serializado.
+        """
+        os.makedirs(carpeta, exist_ok=True)
+        tareas = [
+            (origen, os.path.join(carpeta, f"{nombre}.xlsx"), filas_por_hoja, hojas_por_archivo,
+             os.path.basename(self.archivo_log))
+            for nombre, origen in tablas.items()
+        ]
+        procesos = min(procesos or os.cpu_count() or 1, len(tareas))
+        if procesos <= 1:
+            resultados = [_exportar_tabla(tarea) for tarea in tareas]
+        else:
+            with ProcessPoolExecutor(max_workers=procesos) as ejecutor:
+                resultados = list(ejecutor.map(_exportar_tabla, tareas))
+        return dict(zip(tablas, resultados))
+
     # ---------------------------------------
     # 5️⃣ Cerrar conexión
     # ---------------------------------------
     def cerrar_conexion(self):
         if self.conexion:
-            self.conexion.close()
+            # Se devuelve al pool en lugar de cerrarla
+            self.pool.devolver(self.conexion)
+            self.conexion = None
             print("🔌 Conexión cerrada")
 
     # ---------------------------------------
@@ -105,8 +535,132 @@ class Carga:
     # ---------------------------------------
     def registrar_log(self, mensaje, exito):
         try:
-            with open(self.archivo_log, "a", encoding="utf-8") as archivo:
-                estado = "Éxito" if exito else "Error"
-                archivo.write(f"{datetime.now().isoformat()} | {mensaje} | {estado}\n")
+            estado = "Éxito" if exito else "Error"
+            escritor_log.escribir(self.archivo_log, f"{datetime.now().isoformat()} | {mensaje} | {estado}\n")
         except Exception:
             pass
+
+
+class EscritorExcel:
+    """
+    Escritor de Excel por lotes sobre un libro de openpyxl en modo solo
+    escritura (memoria constante). Cuando una hoja llega a `filas_por_hoja`
+    filas de datos continúa en una hoja nueva, y con `hojas_por_archivo`
+    continúa en un archivo nuevo (datos.xlsx, datos_2.xlsx, ...). Se puede
+    llamar a `escribir` desde varios hilos. Las columnas las fija el
+    primer lote: los siguientes se reordenan por nombre, las que les
+    faltan quedan vacías y las nuevas se informan y no se escriben.
+    """
+
+    def __init__(self, carga, ruta_salida: str, filas_por_hoja: int = None, hojas_por_archivo: int = None):
+        self.ruta_salida = ruta_salida
+        self.filas_por_hoja = min(filas_por_hoja or MAX_FILAS_EXCEL - 1, MAX_FILAS_EXCEL - 1)
+        self.hojas_por_archivo = hojas_por_archivo
+        self.columnas = None
+        self.omitidas = set()
+        self.libro = None
+        self.hoja = None
+        self.filas_hoja = 0
+        self.hojas_archivo = 0
+        self.filas = 0
+        self.rutas = []
+        self.candado = threading.Lock()
+        # Carga aporta la conversión de valores a tipos nativos
+        self.carga = carga
+
+    def escribir(self, df: pd.DataFrame):
+        if df.empty:
+            # Sin filas, pero sus columnas sirven de encabezado si no llega otro lote
+            with self.candado:
+                if self.columnas is None and len(df.columns):
+                    self.columnas = list(df.columns)
+            return
+        with self.candado, instrumentacion.etapa("excel", os.path.basename(self.ruta_salida)) as datos:
+            if self.columnas is None:
+                self.columnas = list(df.columns)
+            nuevas = [col for col in df.columns if col not in self.columnas and col not in self.omitidas]
+            if nuevas:
+                self.omitidas.update(nuevas)
+                mensaje = f"Columnas nuevas omitidas en {os.path.basename(self.ruta_salida)}: {', '.join(map(str, nuevas))}"
+                print(f"⚠️ {mensaje}")
+                self.carga.registrar_log(mensaje, False)
+            # Mongo no garantiza el orden ni el conjunto de campos por lote
+            filas = self.carga.preparar_parametros(self.limpiar_texto(df.reindex(columns=self.columnas)))
+
+            desde = 0
+            while desde < len(filas):
+                if self.hoja is None or self.filas_hoja >= self.filas_por_hoja:
+                    self.nueva_hoja()
+                hasta = min(len(filas), desde + self.filas_por_hoja - self.filas_hoja)
+                for fila in filas[desde:hasta]:
+                    self.hoja.append(fila)
+                self.filas_hoja += hasta - desde
+                self.filas += hasta - desde
+                desde = hasta
+            datos["filas"] = len(df)
+            datos["bytes"] = df.memory_usage(index=False).sum()
+
+    def limpiar_texto(self, df: pd.DataFrame):
+        # openpyxl rechaza los caracteres de control; se quitan por columna
+        limpio = {}
+        for col in df.columns:
+            serie = self.carga.quitar_categoria(df[col])
+            if pd.api.types.is_string_dtype(serie) and pd.api.types.infer_dtype(serie, skipna=True) == "string":
+                limpio[col] = serie.str.replace(ILLEGAL_CHARACTERS_RE.pattern, "", regex=True)
+        return df.assign(**limpio) if limpio else df
+
+    def nueva_hoja(self):
+        if self.libro is not None and self.hojas_por_archivo and self.hojas_archivo >= self.hojas_por_archivo:
+            self.guardar()
+        if self.libro is None:
+            self.libro = Workbook(write_only=True)
+            self.hojas_archivo = 0
+
+        self.hojas_archivo += 1
+        self.hoja = self.libro.create_sheet(f"Hoja{self.hojas_archivo}")
+        self.hoja.append([str(col) for col in self.columnas])
+        self.filas_hoja = 0
+
+    def guardar(self):
+        base, extension = os.path.splitext(self.ruta_salida)
+        ruta = self.ruta_salida if not self.rutas else f"{base}_{len(self.rutas) + 1}{extension}"
+        self.libro.save(ruta)
+        self.rutas.append(ruta)
+        self.libro = None
+        self.hoja = None
+
+    def cerrar(self):
+        with self.candado:
+            if self.libro is None and not self.rutas and self.columnas is not None:
+                # Todos los lotes vinieron vacíos: se guarda solo el encabezado
+                self.nueva_hoja()
+            if self.libro is not None:
+                self.guardar()
+            return self.rutas
+
+    def descartar(self):
+        # Tras un error: no se guarda el libro abierto y se borran los
+        # archivos ya escritos, que solo tienen parte de los datos
+        with self.candado:
+            if self.libro is not None:
+                for hoja in self.libro.worksheets:
+                    try:
+                        hoja.close()
+                    except Exception:
+                        pass
+            self.libro = None
+            self.hoja = None
+            for ruta in self.rutas:
+                try:
+                    os.remove(ruta)
+                except OSError:
+                    pass
+            self.rutas = []
+
+
+def _exportar_tabla(tarea):
+    # Se ejecuta en un proceso hijo: crea su propio Carga (sin conexión)
+    origen, ruta_salida, filas_por_hoja, hojas_por_archivo, nombre_archivo_log = tarea
+    cargador = Carga("", "", "", "", nombre_archivo_log=nombre_archivo_log)
+    lotes = cargador.iterar_parquet(origen) if isinstance(origen, str) else [origen]
+    return cargador.exportar_lotes_a_excel(lotes, ruta_salida, filas_por_hoja, hojas_por_archivo)
@@ -0,0 +1,127 @@
+"""
+Capa compartida de conexiones para Extraccion y Carga.
+
+- MongoDB: un MongoClient por (uri, tamaño de pool) y por proceso. MongoClient
+  ya maneja su propio pool de sockets y es seguro entre hilos, así que los
+  trabajadores de un mismo proceso lo comparten.
+- SQL Server: un pool de conexiones pyodbc con tamaño máximo y chequeo de
+  salud (SELECT 1) al entregar cada conexión.
+
+Las cachés se indexan por PID para que cada proceso hijo cree sus propias
+conexiones en lugar de heredar sockets del proceso padre.
+"""
+
+import os
+import queue
+import threading
+
+from pymongo import MongoClient
+
+
+_clientes_mongo = {}
+_pools_sqlserver = {}
+_candado = threading.Lock()
+
+
+# ------------------------------------------
+# MONGODB
+# ------------------------------------------
+def obtener_cliente_mongo(uri: str, tamano_pool: int = 100):
+    clave = (uri, tamano_pool, os.getpid())
+    with _candado:
+        cliente = _clientes_mongo.get(clave)
+        if cliente is None:
+            cliente = MongoClient(uri, maxPoolSize=tamano_pool)
+            _clientes_mongo[clave] = cliente
+        return cliente
+
+
+# ------------------------------------------
+# SQL SERVER
+# ------------------------------------------
+class PoolSqlServer:
+    def __init__(self, cadena_conexion: str, tamano_maximo: int = 8, espera: float = 30):
+        self.cadena_conexion = cadena_conexion
+        self.tamano_maximo = tamano_maximo
+        self.espera = espera
+        self.libres = queue.LifoQueue()
+        self.abiertas = 0
+        self.candado = threading.Lock()
+
+    def tomar(self):
+        """
+        Entrega una conexión libre que responda a SELECT 1; si no hay y no se
+        llegó al máximo abre una nueva, y si no espera hasta `espera` segundos.
+        Las conexiones recién abiertas no se vuelven a chequear.
+        """
+        while True:
+            try:
+                conexion = self.libres.get_nowait()
+            except queue.Empty:
+                conexion, nueva = self.abrir_o_esperar()
+                if nueva:
+                    return conexion
+
+            if self.esta_viva(conexion):
+                return conexion
+            self.descartar(conexion)
+
+    def abrir_o_esperar(self):
+        with self.candado:
+            puede_abrir = self.abiertas < self.tamano_maximo
+            if puede_abrir:
+                self.abiertas += 1
+        if puede_abrir:
+            # pyodbc se importa aquí para que Extraccion no dependa del
+            # driver ODBC de SQL Server
+            import pyodbc
+            try:
+                return pyodbc.connect(self.cadena_conexion), True
+            except Exception:
+                with self.candado:
+                    self.abiertas -= 1
+                raise
+        try:
+            return self.libres.get(timeout=self.espera), False
+        except queue.Empty:
+            raise TimeoutError(f"No hay conexiones libres en el pool ({self.tamano_maximo} en uso)")
+
+    def devolver(self, conexion):
+        try:
+            # No se devuelve al pool una transacción a medias
+            conexion.rollback()
+            self.libres.put(conexion)
+        except Exception:
+            self.descartar(conexion)
+
+    def descartar(self, conexion):
+        try:
+            conexion.close()
+        except Exception:
+            pass
+        with self.candado:
+            self.abiertas -= 1
+
+    def esta_viva(self, conexion):
+        try:
+            conexion.cursor().execute("SELECT 1").fetchone()
+            return True
+        except Exception:
+            return False
+
+    def cerrar(self):
+        while True:
+            try:
+                self.descartar(self.libres.get_nowait())
+            except queue.Empty:
+                return
+
+
+def obtener_pool_sqlserver(cadena_conexion: str, tamano_maximo: int = 8):
+    clave = (cadena_conexion, os.getpid())
+    with _candado:
+        pool = _pools_sqlserver.get(clave)
+        if pool is None:
+            pool = PoolSqlServer(cadena_conexion, tamano_maximo)
+            _pools_sqlserver[clave] = pool
+        return pool
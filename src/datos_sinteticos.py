@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+from bson import ObjectId
+
+
+class GeneradorDatos:
+    """
+    Genera DataFrames con la forma de las colecciones de Airbnb CDMX
+    (MX_listings, MX_reviews, MX_calendar) para benchmarks: precios como
+    "$1,234.00", available como 't'/'f', host_since y date como texto ISO
+    y comentarios de texto libre con <br/>.
+    """
+
+    ALCALDIAS = [
+        "Cuauhtémoc", "Miguel Hidalgo", "Benito Juárez", "Coyoacán", "Álvaro Obregón",
+        "Tlalpan", "Iztapalapa", "Gustavo A. Madero", "Venustiano Carranza", "Azcapotzalco",
+        "Iztacalco", "Xochimilco", "Cuajimalpa de Morelos", "La Magdalena Contreras",
+        "Tláhuac", "Milpa Alta",
+    ]
+    TIPOS_HABITACION = ["Entire home/apt", "Private room", "Shared room", "Hotel room"]
+    FRASES = [
+        "Great place to stay", "Excelente ubicación", "Very clean and comfortable",
+        "El anfitrión fue muy amable", "Would definitely come back", "Muy buena comunicación",
+        "The neighborhood is lovely", "Todo perfecto", "Close to restaurants and museums",
+        "La cama muy cómoda",
+    ]
+
+    def __init__(self, semilla=42):
+        self.rng = np.random.default_rng(semilla)
+
+    def precios(self, n, minimo=200, maximo=20000, distintos=3000):
+        # Los precios reales se repiten mucho; se sortean de un catálogo
+        catalogo = np.array([f"${valor:,.2f}" for valor in self.rng.integers(minimo, maximo, size=distintos)],
+                            dtype=object)
+        return catalogo[self.rng.integers(0, distintos, size=n)]
+
+    def fechas(self, n, inicio, dias):
+        catalogo = pd.date_range(inicio, periods=dias, freq="D").strftime("%Y-%m-%d").to_numpy(dtype=object)
+        return catalogo[self.rng.integers(0, dias, size=n)]
+
+    def object_ids(self, n):
+        return [ObjectId() for _ in range(n)]
+
+    def generar_listings(self, n):
+        ids = np.arange(1, n + 1, dtype=np.int64) * 1000 + 7
+        df = pd.DataFrame({
+            "_id": self.object_ids(n),
+            "id": ids,
+            "name": [f"Departamento {i} en CDMX" for i in range(n)],
+            "host_id": self.rng.integers(1_000, 500_000_000, size=n),
+            "host_name": self.rng.choice(["Ana", "Luis", "María", "Carlos", "Sofía", "Jorge"], size=n),
+            "host_since": self.fechas(n, "2010-01-01", 5000),
+            "neighbourhood_cleansed": self.rng.choice(self.ALCALDIAS, size=n),
+            "room_type": self.rng.choice(self.TIPOS_HABITACION, size=n, p=[0.6, 0.35, 0.03, 0.02]),
+            "latitude": 19.43 + self.rng.normal(0, 0.05, size=n),
+            "longitude": -99.13 + self.rng.normal(0, 0.05, size=n),
+            "price": self.precios(n),
+            "bedrooms": np.where(self.rng.random(n) < 0.1, np.nan, self.rng.integers(1, 5, size=n)),
+            "beds": np.where(self.rng.random(n) < 0.05, np.nan, self.rng.integers(1, 6, size=n)),
+            "bathrooms_text": self.rng.choice(["1 bath", "1.5 baths", "2 baths", "1 shared bath", None], size=n),
+            "amenities": self.rng.choice(['["Wifi", "Kitchen"]', '["Wifi", "Washer", "TV"]', '["Wifi"]'], size=n),
+            "last_scraped": "2024-06-27",
+        })
+        return df
+
+    def generar_reviews(self, n, ids_listings):
+        comentarios = np.array([
+            f"{a}.<br/>{b}!" if i % 3 else f"  {a}. {b}  "
+            for i, (a, b) in enumerate(zip(self.rng.choice(self.FRASES, 500), self.rng.choice(self.FRASES, 500)))
+        ], dtype=object)
+        seleccion = comentarios[self.rng.integers(0, len(comentarios), size=n)]
+        seleccion[self.rng.random(n) < 0.01] = None
+        return pd.DataFrame({
+            "_id": self.object_ids(n),
+            "listing_id": self.rng.choice(ids_listings, size=n),
+            "id": np.arange(n, dtype=np.int64) + 10_000_000,
+            "date": self.fechas(n, "2015-01-01", 3400),
+            "reviewer_id": self.rng.integers(1_000, 500_000_000, size=n),
+            "reviewer_name": self.rng.choice(["Ana", "John", "Marie", "Kenji", "Lucía"], size=n),
+            "comments": seleccion,
+        })
+
+    def generar_calendar(self, n, ids_listings, dias=365):
+        # Una fila por listing y día, como en MX_calendar
+        listings = np.resize(np.repeat(np.asarray(ids_listings), dias), n)
+        dias_catalogo = pd.date_range("2024-06-28", periods=dias, freq="D").strftime("%Y-%m-%d").to_numpy(dtype=object)
+        precios = self.precios(n)
+        return pd.DataFrame({
+            "_id": self.object_ids(n),
+            "listing_id": listings,
+            "date": dias_catalogo[np.arange(n) % dias],
+            "available": self.rng.choice(["t", "f"], size=n, p=[0.6, 0.4]).astype(object),
+            "price": precios,
+            "adjusted_price": np.where(self.rng.random(n) < 0.9, None, precios),
+            "minimum_nights": self.rng.integers(1, 30, size=n),
+            "maximum_nights": self.rng.integers(30, 1125, size=n),
+        })
+
+    def generar(self, filas_calendar):
+        """
+        Genera las tres colecciones con proporciones parecidas a las reales:
+        ~365 filas de calendar por listing y ~0.15 reviews por fila de calendar.
+        """
+        n_listings = max(1, -(-filas_calendar // 365))
+        listings = self.generar_listings(n_listings)
+        reviews = self.generar_reviews(max(1, int(filas_calendar * 0.15)), listings["id"].to_numpy())
+        calendar = self.generar_calendar(filas_calendar, listings["id"].to_numpy())
+        return listings, reviews, calendar
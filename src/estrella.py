@@ -0,0 +1,183 @@
+"""
+Modelo dimensional (esquema estrella) para el data warehouse de Airbnb.
+
+- CacheClaves: asigna claves sustitutas enteras a claves naturales con un
+  diccionario en memoria que se guarda en Estado/claves_sustitutas.json, así
+  las claves son las mismas entre ejecuciones y los hechos las resuelven sin
+  consultar SQL Server fila por fila.
+- ModeloEstrella: divide los DataFrames transformados en dimensiones
+  (dim_host, dim_neighbourhood, dim_room_type, dim_listing, dim_date) y
+  hechos (fact_calendar, fact_reviews) con claves enteras.
+"""
+
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+class CacheClaves:
+    """
+    Claves sustitutas por dimensión: {dimension: {clave_natural: clave}}.
+    Las claves empiezan en 1; el 0 queda para las filas sin clave natural.
+    Como la clave depende solo de la clave natural, un hecho puede recibir
+    la clave de un listing antes de que se cargue su fila en dim_listing.
+    """
+
+    def __init__(self, archivo_estado="claves_sustitutas.json"):
+        ruta_base = os.path.dirname(os.path.abspath(__file__))
+        self.archivo_estado = os.path.join(ruta_base, "Estado", archivo_estado)
+        self.claves = {}
+        self.pendientes = False
+        self.candado = threading.Lock()
+        self.cargar()
+
+    def cargar(self):
+        try:
+            with open(self.archivo_estado, "r", encoding="utf-8") as archivo:
+                self.claves = json.load(archivo)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.claves = {}
+
+    def asignar(self, dimension, serie):
+        """
+        Devuelve un arreglo int32 con la clave sustituta de cada fila. Solo
+        se buscan en el diccionario los valores únicos de la serie; las
+        claves nuevas se agregan al caché y quedan pendientes de guardar.
+        """
+        codigos, unicos = pd.factorize(serie)
+        with self.candado:
+            mapa = self.claves.setdefault(dimension, {})
+            claves_unicos = np.empty(len(unicos) + 1, dtype=np.int32)
+            for i, valor in enumerate(unicos):
+                natural = self.normalizar(valor)
+                clave = mapa.get(natural)
+                if clave is None:
+                    clave = len(mapa) + 1
+                    mapa[natural] = clave
+                    self.pendientes = True
+                claves_unicos[i] = clave
+            # factorize marca los nulos con -1: van a la última posición
+            claves_unicos[-1] = 0
+        return claves_unicos[codigos]
+
+    def normalizar(self, valor):
+        # host_id puede llegar como float si la columna tuvo nulos
+        if isinstance(valor, (float, np.floating)) and float(valor).is_integer():
+            valor = int(valor)
+        return str(valor)
+
+    def guardar(self):
+        with self.candado:
+            if not self.pendientes:
+                return True
+            try:
+                os.makedirs(os.path.dirname(self.archivo_estado), exist_ok=True)
+                temporal = self.archivo_estado + ".tmp"
+                with open(temporal, "w", encoding="utf-8") as archivo:
+                    json.dump(self.claves, archivo)
+                os.replace(temporal, self.archivo_estado)
+                self.pendientes = False
+                return True
+            except Exception as e:
+                print(f"No se pudo guardar el caché de claves: {e}")
+                return False
+
+
+class ModeloEstrella:
+    # Tabla de dimensión: (clave sustituta, clave natural, columnas extra)
+    DIMENSIONES = {
+        "dim_host": ("host_sk", "host_id", None),
+        "dim_neighbourhood": ("neighbourhood_sk", "neighbourhood_cleansed",
+                              ["neighbourhood", "neighbourhood_group_cleansed"]),
+        "dim_room_type": ("room_type_sk", "room_type", []),
+    }
+    # Tabla de hechos de cada colección (listings solo produce dimensiones)
+    HECHOS = {
+        "calendar": "fact_calendar",
+        "reviews": "fact_reviews",
+    }
+
+    def __init__(self, cache=None):
+        self.cache = cache or CacheClaves()
+
+    def dividir(self, df, tipo):
+        """
+        Devuelve {tabla: DataFrame} con las dimensiones y hechos que salen
+        de un lote transformado de `tipo` (listings, reviews o calendar).
+        """
+        divisiones = {
+            "listings": self.dividir_listings,
+            "reviews": self.dividir_reviews,
+            "calendar": self.dividir_calendar,
+        }
+        return divisiones[tipo](df)
+
+    # ------------------------------------------
+    # DIMENSIONES
+    # ------------------------------------------
+    def dividir_listings(self, df):
+        tablas = {}
+        listing = df.copy()
+        listing.insert(0, "listing_sk", self.cache.asignar("dim_listing", df["id"]))
+
+        movidas = set()
+        for tabla, (clave_sk, natural, extra) in self.DIMENSIONES.items():
+            if natural not in df.columns:
+                continue
+            if extra is None:
+                # Todos los atributos host_* viven en dim_host
+                extra = [col for col in df.columns if col.startswith("host_") and col != natural]
+            columnas = [natural] + [col for col in extra if col in df.columns]
+
+            claves = self.cache.asignar(tabla, df[natural])
+            dimension = df[columnas].copy()
+            dimension.insert(0, clave_sk, claves)
+            dimension = dimension[claves > 0].drop_duplicates(subset=[clave_sk], keep="last")
+            tablas[tabla] = dimension.reset_index(drop=True)
+
+            listing[clave_sk] = claves
+            movidas.update(columnas)
+
+        tablas["dim_listing"] = listing.drop(columns=list(movidas)).reset_index(drop=True)
+        return tablas
+
+    def dimension_fecha(self, fechas):
+        """
+        dim_date con clave inteligente AAAAMMDD: se calcula de la fecha misma
+        y no necesita caché.
+        """
+        unicas = pd.DatetimeIndex(pd.unique(fechas.dropna())).normalize().unique()
+        return pd.DataFrame({
+            "date_sk": self.clave_fecha(pd.Series(unicas)),
+            "date": unicas,
+            "year": unicas.year.astype(np.int16),
+            "quarter": unicas.quarter.astype(np.int8),
+            "month": unicas.month.astype(np.int8),
+            "day": unicas.day.astype(np.int8),
+            "day_of_week": unicas.dayofweek.astype(np.int8),
+            "is_weekend": unicas.dayofweek >= 5,
+        })
+
+    def clave_fecha(self, fechas):
+        fechas = pd.to_datetime(fechas)
+        claves = (fechas.dt.year * 10000 + fechas.dt.month * 100 + fechas.dt.day).fillna(0)
+        return claves.to_numpy(dtype=np.int32)
+
+    # ------------------------------------------
+    # HECHOS
+    # ------------------------------------------
+    def hecho(self, df, nombre):
+        hecho = df.drop(columns=["listing_id", "date"])
+        hecho.insert(0, "listing_sk", self.cache.asignar("dim_listing", df["listing_id"]))
+        hecho.insert(1, "date_sk", self.clave_fecha(df["date"]))
+        return {"dim_date": self.dimension_fecha(df["date"]), nombre: hecho.reset_index(drop=True)}
+
+    def dividir_calendar(self, df):
+        # El _id de Mongo no aporta nada al hecho: su clave es listing + fecha
+        return self.hecho(df.drop(columns=["_id"], errors="ignore"), self.HECHOS["calendar"])
+
+    def dividir_reviews(self, df):
+        return self.hecho(df, self.HECHOS["reviews"])
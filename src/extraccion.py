@@ -1,27 +1,40 @@
 import pandas as pd
 import os
-from pymongo import MongoClient
+import json
+import time
+from bson import ObjectId
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from conexiones import obtener_cliente_mongo
+from instrumentacion import escritor_log, instrumentacion
 
 
 
 class Extraccion:
     
-    def __init__(self, uri: str, database: str, nombre_archivo: str = "logs_extraccion.txt"):
+    def __init__(self, uri: str, database: str, nombre_archivo: str = "logs_extraccion.txt",
+                 archivo_estado: str = "marcas_agua.json", tamano_pool: int = 100):
         
         ruta_base = os.path.dirname(os.path.abspath(__file__))
         carpeta_logs = os.path.join(ruta_base, "Logs")
         os.makedirs(carpeta_logs, exist_ok=True)
         self.archivo_log = os.path.join(carpeta_logs, nombre_archivo)
+
+        carpeta_estado = os.path.join(ruta_base, "Estado")
+        self.archivo_estado = os.path.join(carpeta_estado, archivo_estado)
         
         self.uri = uri
         self.database = database
+        self.tamano_pool = tamano_pool
+        self.cliente = None
         self.db = None
+        self.marcas_pendientes = {}
 
     def conectar_mongodb(self):
         try:
-            client = MongoClient(self.uri)
-            self.db = client[self.database]
+            # Cliente compartido por proceso: los hilos reutilizan su pool de sockets
+            self.cliente = obtener_cliente_mongo(self.uri, self.tamano_pool)
+            self.db = self.cliente[self.database]
             self.db.list_collection_names()
             print(f"Conexion exitosa: {self.database}")
             self.registrar_log("Conexion", 0, True)
@@ -31,40 +44,287 @@ class Extraccion:
             self.registrar_log("Conexion", 0, False)
             return None
     
-    def obtener_datos(self, nombre_coleccion: str, limite: int = 0):
+    def obtener_datos(self, nombre_coleccion: str, limite: int = 0, tamano_lote: int = 10000,
+                      columnas: list = None, filtro: dict = None, hint=None):
+        # Si la lectura falla a mitad de camino se devuelve un DataFrame
+        # vacío, nunca uno parcial (el error ya quedó en el log)
+        try:
+            return self.leer_coleccion(nombre_coleccion, limite, tamano_lote, columnas, filtro, hint)
+        except Exception:
+            return pd.DataFrame()
+
+    def leer_coleccion(self, nombre_coleccion: str, limite: int = 0, tamano_lote: int = 10000,
+                       columnas: list = None, filtro: dict = None, hint=None):
+        # Como obtener_datos, pero un error de lectura se propaga
+        lotes = list(self.iterar_lotes(nombre_coleccion, tamano_lote=tamano_lote, limite=limite,
+                                       columnas=columnas, filtro=filtro, hint=hint))
+        if not lotes:
+            return pd.DataFrame()
+        return pd.concat(lotes, ignore_index=True)
+
+    def iterar_lotes(self, nombre_coleccion: str, tamano_lote: int = 10000, limite: int = 0,
+                     columnas: list = None, filtro: dict = None, hint=None):
+        """
+        Recorre la colección con un cursor de tamaño de lote fijo y entrega
+        DataFrames de como máximo `tamano_lote` filas, de modo que la memoria
+        usada depende del lote y no del tamaño de la colección.
+
+        `columnas` y `filtro` se envían a MongoDB como proyección y consulta
+        de `find`, y `hint` fuerza el uso de un índice conocido. Un error de
+        lectura se registra y se vuelve a lanzar: los lotes ya entregados no
+        son la colección completa.
+        """
         if self.db is None:
             print("Error de Conexion")
             self.registrar_log(nombre_coleccion, 0, False)
-            return pd.DataFrame()
+            return
 
+        cursor = None
+        total = 0
         try:
             coleccion = self.db[nombre_coleccion]
-            cursor = coleccion.find().limit(limite) if limite > 0 else coleccion.find()
-            datos = list(cursor)
-            df = pd.DataFrame(datos)
-            
-            if df.empty:
+            cursor = coleccion.find(filtro or {}, self.construir_proyeccion(columnas), batch_size=tamano_lote)
+            if hint is not None:
+                cursor = cursor.hint(hint)
+            if limite > 0:
+                cursor = cursor.limit(limite)
+
+            lote = []
+            inicio = time.perf_counter()
+            for documento in cursor:
+                lote.append(documento)
+                if len(lote) >= tamano_lote:
+                    total += len(lote)
+                    yield self.construir_lote(lote, nombre_coleccion, inicio)
+                    lote = []
+                    inicio = time.perf_counter()
+            if lote:
+                total += len(lote)
+                yield self.construir_lote(lote, nombre_coleccion, inicio)
+
+            if total == 0 and filtro:
+                # Con filtro (delta incremental o rango) no haber documentos no es un error
+                print(f"Extraccion '{nombre_coleccion}' sin documentos nuevos")
+                self.registrar_log(nombre_coleccion, 0, True)
+            elif total == 0:
                 print(f"Error'{nombre_coleccion}' no encontrada o sin registros.")
                 self.registrar_log(nombre_coleccion, 0, False)
             else:
-                print(f"Extraccion '{nombre_coleccion}' ({len(df)} registros)")
-                self.registrar_log(nombre_coleccion, len(df), True)
-            return df
+                print(f"Extraccion '{nombre_coleccion}' ({total} registros)")
+                self.registrar_log(nombre_coleccion, total, True)
+
+        except Exception as e:
+            print(f"Error '{nombre_coleccion}': {e}")
+            self.registrar_log(nombre_coleccion, total, False)
+            raise
+        finally:
+            if cursor is not None:
+                cursor.close()
         
+    def construir_lote(self, documentos: list, nombre_coleccion: str, inicio: float):
+        # El tiempo medido va desde que se pidió el lote al cursor hasta que
+        # el DataFrame está listo (lectura + decodificación BSON + DataFrame)
+        df = pd.DataFrame(documentos)
+        instrumentacion.registrar("extraccion", nombre_coleccion, time.perf_counter() - inicio,
+                                  len(df), df.memory_usage(index=False).sum())
+        return df
+
+    def calcular_rangos(self, nombre_coleccion: str, campo: str = "_id", particiones: int = 4,
+                        filtro: dict = None, tamano_muestra: int = 1000):
+        """
+        Calcula los puntos de corte de `campo` a partir de una muestra
+        aleatoria ($sample) y devuelve una lista de tuplas (inicio, fin),
+        donde None indica un extremo abierto.
+        """
+        if self.db is None or particiones <= 1:
+            return [(None, None)]
+
+        documentos = self.db[nombre_coleccion].aggregate(self.pipeline_muestra(campo, filtro, tamano_muestra))
+        return self.rangos_desde_muestra(documentos, campo, particiones)
+
+    def pipeline_muestra(self, campo: str, filtro: dict = None, tamano_muestra: int = 1000):
+        pipeline = []
+        if filtro:
+            pipeline.append({"$match": filtro})
+        pipeline.append({"$sample": {"size": tamano_muestra}})
+        pipeline.append({"$project": {campo: 1}})
+        return pipeline
+
+    def rangos_desde_muestra(self, documentos, campo: str, particiones: int):
+        muestra = sorted({doc[campo] for doc in documentos if campo in doc})
+        if not muestra:
+            return [(None, None)]
+
+        cortes = []
+        for i in range(1, particiones):
+            valor = muestra[i * len(muestra) // particiones]
+            if not cortes or valor != cortes[-1]:
+                cortes.append(valor)
+
+        limites = [None] + cortes + [None]
+        return list(zip(limites[:-1], limites[1:]))
+
+    def obtener_datos_paralelo(self, nombre_coleccion: str, trabajadores: int = 4, campo: str = "_id",
+                               columnas: list = None, filtro: dict = None, tamano_lote: int = 10000,
+                               usar_procesos: bool = False):
+        """
+        Divide la colección en rangos de `campo` y los lee en paralelo con
+        `trabajadores` hilos (o procesos). Los hilos comparten el MongoClient del
+        pool y cada proceso abre el suyo.
+        Las partes se unen en un único DataFrame.
+        """
+        if self.db is None:
+            print("Error de Conexion")
+            self.registrar_log(nombre_coleccion, 0, False)
+            return pd.DataFrame()
+
+        try:
+            rangos = self.calcular_rangos(nombre_coleccion, campo, trabajadores, filtro)
+            tareas = [
+                (self.uri, self.database, self.archivo_log, nombre_coleccion,
+                 self.filtro_rango(campo, inicio, fin, filtro), columnas, tamano_lote)
+                for inicio, fin in rangos
+            ]
+
+            ejecutor = ProcessPoolExecutor if usar_procesos else ThreadPoolExecutor
+            with ejecutor(max_workers=trabajadores) as pool:
+                partes = [df for df in pool.map(_extraer_rango, tareas) if not df.empty]
+
+            df = pd.concat(partes, ignore_index=True) if partes else pd.DataFrame()
+            print(f"Extraccion paralela '{nombre_coleccion}' ({len(df)} registros, {len(rangos)} rangos)")
+            self.registrar_log(nombre_coleccion, len(df), not df.empty)
+            return df
+
         except Exception as e:
             print(f"Error '{nombre_coleccion}': {e}")
             self.registrar_log(nombre_coleccion, 0, False)
             return pd.DataFrame()
-        
+
+    def obtener_datos_incrementales(self, nombre_coleccion: str, campo: str = "_id", columnas: list = None,
+                                    tamano_lote: int = 10000, confirmar: bool = False):
+        """
+        Extrae solo los documentos posteriores a la marca de agua guardada
+        para la colección. Con `_id` se usa $gt; con campos de fecha
+        (`last_scraped`, `date`) se usa $gte y se deja que la carga por
+        upsert absorba las filas del último día que se vuelven a leer.
+
+        La nueva marca queda pendiente hasta llamar a `confirmar_marca_agua`
+        después de una carga exitosa (`confirmar=True` la guarda ya). Si la
+        lectura falla se devuelve None, a diferencia del DataFrame vacío de
+        un delta sin documentos nuevos, y no queda ninguna marca pendiente:
+        la próxima ejecución vuelve a leer desde la anterior.
+        """
+        filtro = self.filtro_incremental(nombre_coleccion, campo)
+        if columnas and campo not in columnas:
+            columnas = list(columnas) + [campo]
+
+        self.marcas_pendientes.pop(nombre_coleccion, None)
+        try:
+            df = self.leer_coleccion(nombre_coleccion, tamano_lote=tamano_lote, columnas=columnas, filtro=filtro)
+        except Exception:
+            return None
+        self.actualizar_marca_agua(nombre_coleccion, campo, df, confirmar)
+        return df
+
+    def filtro_incremental(self, nombre_coleccion: str, campo: str = "_id"):
+        marca = self.leer_marca_agua(nombre_coleccion, campo)
+        if marca is None:
+            return None
+        return {campo: {"$gt" if campo == "_id" else "$gte": marca}}
+
+    def actualizar_marca_agua(self, nombre_coleccion: str, campo: str, df: pd.DataFrame, confirmar: bool = False):
+        if df.empty or campo not in df.columns:
+            return
+        self.marcas_pendientes[nombre_coleccion] = (campo, df[campo].dropna().max())
+        if confirmar:
+            self.confirmar_marca_agua(nombre_coleccion)
+
+    def leer_marca_agua(self, nombre_coleccion: str, campo: str = "_id"):
+        try:
+            with open(self.archivo_estado, "r", encoding="utf-8") as archivo:
+                estado = json.load(archivo)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        marca = estado.get(nombre_coleccion)
+        if not marca or marca.get("campo") != campo:
+            return None
+        if marca.get("tipo") == "ObjectId":
+            return ObjectId(marca["valor"])
+        if marca.get("tipo") == "datetime":
+            return datetime.fromisoformat(marca["valor"])
+        return marca["valor"]
+
+    def confirmar_marca_agua(self, nombre_coleccion: str):
+        if nombre_coleccion not in self.marcas_pendientes:
+            return False
+
+        campo, valor = self.marcas_pendientes.pop(nombre_coleccion)
+        if isinstance(valor, ObjectId):
+            marca = {"campo": campo, "tipo": "ObjectId", "valor": str(valor)}
+        elif isinstance(valor, datetime):
+            marca = {"campo": campo, "tipo": "datetime", "valor": valor.isoformat()}
+        else:
+            marca = {"campo": campo, "tipo": type(valor).__name__, "valor": valor.item() if hasattr(valor, "item") else valor}
+
+        try:
+            os.makedirs(os.path.dirname(self.archivo_estado), exist_ok=True)
+            try:
+                with open(self.archivo_estado, "r", encoding="utf-8") as archivo:
+                    estado = json.load(archivo)
+            except (FileNotFoundError, json.JSONDecodeError):
+                estado = {}
+
+            estado[nombre_coleccion] = marca
+            temporal = self.archivo_estado + ".tmp"
+            with open(temporal, "w", encoding="utf-8") as archivo:
+                json.dump(estado, archivo, indent=2)
+            os.replace(temporal, self.archivo_estado)
+            return True
+        except Exception as e:
+            print(f"No se pudo guardar la marca de agua: {e}")
+            return False
+
+    def filtro_rango(self, campo: str, inicio, fin, filtro: dict = None):
+        condicion = {}
+        if inicio is not None:
+            condicion["$gte"] = inicio
+        if fin is not None:
+            condicion["$lt"] = fin
+
+        partes = [f for f in (filtro, {campo: condicion} if condicion else None) if f]
+        if not partes:
+            return {}
+        return partes[0] if len(partes) == 1 else {"$and": partes}
+
+    def construir_proyeccion(self, columnas: list = None):
+        if not columnas:
+            return None
+        proyeccion = {columna: 1 for columna in columnas}
+        if "_id" not in proyeccion:
+            proyeccion["_id"] = 0
+        return proyeccion
+
     def registrar_log(self, coleccion, cantidad, estado):
         try:
-            with open(self.archivo_log, "a", encoding="utf-8") as archivo:
-                log_entry = (
-                    f"{datetime.now().isoformat()} | "
-                    f"Colección: {coleccion} | "
-                    f"Cantidad: {cantidad} | "
-                    f"Estado: {'Éxito' if estado else 'Error'}\n"
-                )
-                archivo.write(log_entry)
+            log_entry = (
+                f"{datetime.now().isoformat()} | "
+                f"Colección: {coleccion} | "
+                f"Cantidad: {cantidad} | "
+                f"Estado: {'Éxito' if estado else 'Error'}\n"
+            )
+            escritor_log.escribir(self.archivo_log, log_entry)
         except Exception as err:
-            print(f"No se pudo registrar el log: {err}")
\ No newline at end of file
+            print(f"No se pudo registrar el log: {err}")
+
+
+def _extraer_rango(tarea):
+    # Se ejecuta en cada trabajador. Los hilos comparten el MongoClient
+    # cacheado del proceso (cada lectura usa su propio socket del pool) y
+    # cada proceso hijo crea el suyo.
+    uri, database, nombre_archivo, nombre_coleccion, filtro, columnas, tamano_lote = tarea
+    extractor = Extraccion(uri, database, nombre_archivo)
+    # Un rango que falla hace fallar toda la extracción paralela
+    if extractor.conectar_mongodb() is None:
+        raise ConnectionError(f"sin conexión a MongoDB para leer '{nombre_coleccion}'")
+    return extractor.leer_coleccion(nombre_coleccion, tamano_lote=tamano_lote, columnas=columnas, filtro=filtro)
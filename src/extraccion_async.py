@@ -0,0 +1,194 @@
+import asyncio
+import time
+import pandas as pd
+from pymongo import AsyncMongoClient
+
+from extraccion import Extraccion
+
+
+class ExtraccionAsync(Extraccion):
+    """
+    Variante asíncrona de Extraccion basada en AsyncMongoClient de PyMongo.
+    Permite leer MX_listings, MX_reviews y MX_calendar (y varios rangos de
+    cada una) al mismo tiempo, de modo que el tiempo total se acerca al de
+    la colección más lenta y no a la suma de las tres.
+
+    Los métodos de extracción son corrutinas; las utilidades de proyección,
+    rangos, marcas de agua y log se heredan de Extraccion.
+    """
+
+    def __init__(self, uri: str, database: str, nombre_archivo: str = "logs_extraccion.txt",
+                 archivo_estado: str = "marcas_agua.json", cliente=None):
+        super().__init__(uri, database, nombre_archivo, archivo_estado)
+        # Se puede pasar un cliente ya creado (p. ej. un mock en pruebas)
+        self.cliente = cliente
+
+    async def conectar_mongodb(self):
+        try:
+            if self.cliente is None:
+                self.cliente = AsyncMongoClient(self.uri)
+            self.db = self.cliente[self.database]
+            await self.db.list_collection_names()
+            print(f"Conexion exitosa: {self.database}")
+            self.registrar_log("Conexion", 0, True)
+            return self.db
+        except Exception as e:
+            print(f"Error de Conexion: {e}")
+            self.registrar_log("Conexion", 0, False)
+            return None
+
+    async def cerrar_conexion(self):
+        if self.cliente is not None:
+            await self.cliente.close()
+            self.cliente = None
+            self.db = None
+
+    async def obtener_datos(self, nombre_coleccion: str, limite: int = 0, tamano_lote: int = 10000,
+                            columnas: list = None, filtro: dict = None, hint=None):
+        # Ante un error se devuelve un DataFrame vacío, nunca uno parcial
+        try:
+            return await self.leer_coleccion(nombre_coleccion, limite, tamano_lote, columnas, filtro, hint)
+        except Exception:
+            return pd.DataFrame()
+
+    async def leer_coleccion(self, nombre_coleccion: str, limite: int = 0, tamano_lote: int = 10000,
+                             columnas: list = None, filtro: dict = None, hint=None):
+        lotes = [lote async for lote in self.iterar_lotes(nombre_coleccion, tamano_lote=tamano_lote, limite=limite,
+                                                          columnas=columnas, filtro=filtro, hint=hint)]
+        if not lotes:
+            return pd.DataFrame()
+        return pd.concat(lotes, ignore_index=True)
+
+    async def iterar_lotes(self, nombre_coleccion: str, tamano_lote: int = 10000, limite: int = 0,
+                           columnas: list = None, filtro: dict = None, hint=None):
+        """
+        Generador asíncrono de DataFrames de como máximo `tamano_lote` filas.
+        La construcción del DataFrame se hace en un hilo para no frenar las
+        lecturas de las otras colecciones mientras tanto. Los errores de
+        lectura se registran y se vuelven a lanzar.
+        """
+        if self.db is None:
+            print("Error de Conexion")
+            self.registrar_log(nombre_coleccion, 0, False)
+            return
+
+        cursor = None
+        total = 0
+        try:
+            coleccion = self.db[nombre_coleccion]
+            cursor = coleccion.find(filtro or {}, self.construir_proyeccion(columnas), batch_size=tamano_lote)
+            if hint is not None:
+                cursor = cursor.hint(hint)
+            if limite > 0:
+                cursor = cursor.limit(limite)
+
+            while True:
+                inicio = time.perf_counter()
+                documentos = await cursor.to_list(length=tamano_lote)
+                if not documentos:
+                    break
+                total += len(documentos)
+                yield await asyncio.to_thread(self.construir_lote, documentos, nombre_coleccion, inicio)
+
+            if total == 0 and filtro:
+                # Con filtro (delta incremental o rango) no haber documentos no es un error
+                print(f"Extraccion '{nombre_coleccion}' sin documentos nuevos")
+                self.registrar_log(nombre_coleccion, 0, True)
+            elif total == 0:
+                print(f"Error'{nombre_coleccion}' no encontrada o sin registros.")
+                self.registrar_log(nombre_coleccion, 0, False)
+            else:
+                print(f"Extraccion '{nombre_coleccion}' ({total} registros)")
+                self.registrar_log(nombre_coleccion, total, True)
+
+        except Exception as e:
+            print(f"Error '{nombre_coleccion}': {e}")
+            self.registrar_log(nombre_coleccion, total, False)
+            raise
+        finally:
+            if cursor is not None:
+                await cursor.close()
+
+    async def calcular_rangos(self, nombre_coleccion: str, campo: str = "_id", particiones: int = 4,
+                              filtro: dict = None, tamano_muestra: int = 1000):
+        if self.db is None or particiones <= 1:
+            return [(None, None)]
+
+        cursor = await self.db[nombre_coleccion].aggregate(self.pipeline_muestra(campo, filtro, tamano_muestra))
+        documentos = await cursor.to_list(length=None)
+        return self.rangos_desde_muestra(documentos, campo, particiones)
+
+    async def obtener_datos_paralelo(self, nombre_coleccion: str, trabajadores: int = 4, campo: str = "_id",
+                                     columnas: list = None, filtro: dict = None, tamano_lote: int = 10000):
+        """
+        Divide la colección en rangos de `campo` y lee todos los rangos a la
+        vez sobre el mismo cliente asíncrono.
+        """
+        if self.db is None:
+            print("Error de Conexion")
+            self.registrar_log(nombre_coleccion, 0, False)
+            return pd.DataFrame()
+
+        try:
+            rangos = await self.calcular_rangos(nombre_coleccion, campo, trabajadores, filtro)
+            partes = await asyncio.gather(*[
+                self.leer_coleccion(nombre_coleccion, tamano_lote=tamano_lote, columnas=columnas,
+                                    filtro=self.filtro_rango(campo, inicio, fin, filtro))
+                for inicio, fin in rangos
+            ])
+            partes = [df for df in partes if not df.empty]
+
+            df = pd.concat(partes, ignore_index=True) if partes else pd.DataFrame()
+            print(f"Extraccion paralela '{nombre_coleccion}' ({len(df)} registros, {len(rangos)} rangos)")
+            self.registrar_log(nombre_coleccion, len(df), not df.empty)
+            return df
+
+        except Exception as e:
+            print(f"Error '{nombre_coleccion}': {e}")
+            self.registrar_log(nombre_coleccion, 0, False)
+            return pd.DataFrame()
+
+    async def obtener_datos_incrementales(self, nombre_coleccion: str, campo: str = "_id", columnas: list = None,
+                                          tamano_lote: int = 10000, confirmar: bool = False):
+        # Igual que Extraccion.obtener_datos_incrementales: None y sin marca tras un error
+        filtro = self.filtro_incremental(nombre_coleccion, campo)
+        if columnas and campo not in columnas:
+            columnas = list(columnas) + [campo]
+
+        self.marcas_pendientes.pop(nombre_coleccion, None)
+        try:
+            df = await self.leer_coleccion(nombre_coleccion, tamano_lote=tamano_lote, columnas=columnas, filtro=filtro)
+        except Exception:
+            return None
+        self.actualizar_marca_agua(nombre_coleccion, campo, df, confirmar)
+        return df
+
+    async def obtener_colecciones(self, nombres_colecciones: list, particiones: int = 1, campo: str = "_id",
+                                  tamano_lote: int = 10000):
+        """
+        Extrae varias colecciones al mismo tiempo y devuelve un diccionario
+        {nombre_coleccion: DataFrame}. Con `particiones` > 1 cada colección
+        se lee además por rangos de `campo`.
+        """
+        if particiones > 1:
+            tareas = [self.obtener_datos_paralelo(nombre, particiones, campo, tamano_lote=tamano_lote)
+                      for nombre in nombres_colecciones]
+        else:
+            tareas = [self.obtener_datos(nombre, tamano_lote=tamano_lote) for nombre in nombres_colecciones]
+        resultados = await asyncio.gather(*tareas)
+        return dict(zip(nombres_colecciones, resultados))
+
+
+async def main():
+    extraccion = ExtraccionAsync("mongodb://localhost:27017/", "MX_DB")
+    if await extraccion.conectar_mongodb() is None:
+        return
+
+    datos = await extraccion.obtener_colecciones(["MX_listings", "MX_reviews", "MX_calendar"], particiones=4)
+    for nombre, df in datos.items():
+        print(f"{nombre}: {len(df)} registros")
+    await extraccion.cerrar_conexion()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,247 @@
+"""
+Instrumentación común para Extraccion, Transformacion y Carga.
+
+- EscritorLog: escritor de logs con buffer. Las líneas se encolan y un hilo
+  en segundo plano las escribe por grupos, así registrar un log no abre y
+  cierra el archivo en cada llamada ni bloquea la etapa.
+- Instrumentacion: registra por etapa y por lote el tiempo, las filas, los
+  bytes y el pico de RSS, y los escribe como JSON lines en Logs/metricas.jsonl.
+  Con `configurar` se puede activar cProfile o tracemalloc para etapas
+  concretas; tracemalloc se enciende una vez para toda la ejecución.
+"""
+
+import atexit
+import cProfile
+import functools
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+CARPETA_LOGS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Logs")
+
+
+def rss_maximo_mb():
+    # ru_maxrss está en KB en Linux y en bytes en macOS; en Windows no hay dato
+    if resource is None:
+        return None
+    maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(maximo / divisor, 1)
+
+
+# ------------------------------------------
+# ESCRITOR DE LOGS CON BUFFER
+# ------------------------------------------
+class EscritorLog:
+    def __init__(self, intervalo=1.0, maximo_lote=1000):
+        self.intervalo = intervalo
+        self.maximo_lote = maximo_lote
+        self.cola = queue.Queue()
+        self.hilo = None
+        self.pid = None
+        self.candado = threading.Lock()
+
+    def escribir(self, ruta, linea):
+        self.iniciar()
+        self.cola.put((ruta, linea))
+
+    def iniciar(self):
+        # Se revisa el PID para que un proceso hijo arranque su propio hilo
+        with self.candado:
+            if self.hilo is None or self.pid != os.getpid():
+                self.pid = os.getpid()
+                self.cola = queue.Queue()
+                self.hilo = threading.Thread(target=self.trabajar, name="escritor-log", daemon=True)
+                self.hilo.start()
+
+    def trabajar(self):
+        while True:
+            try:
+                pendientes = [self.cola.get(timeout=self.intervalo)]
+            except queue.Empty:
+                continue
+            while len(pendientes) < self.maximo_lote:
+                try:
+                    pendientes.append(self.cola.get_nowait())
+                except queue.Empty:
+                    break
+
+            por_archivo = {}
+            for ruta, linea in pendientes:
+                por_archivo.setdefault(ruta, []).append(linea)
+            for ruta, lineas in por_archivo.items():
+                try:
+                    with open(ruta, "a", encoding="utf-8") as archivo:
+                        archivo.writelines(lineas)
+                except Exception as e:
+                    print(f"No se pudo escribir el log: {e}")
+            for _ in pendientes:
+                self.cola.task_done()
+
+    def vaciar(self):
+        # Espera a que todo lo encolado esté escrito
+        if self.hilo is not None and self.pid == os.getpid():
+            self.cola.join()
+
+
+escritor_log = EscritorLog()
+atexit.register(escritor_log.vaciar)
+
+
+# ------------------------------------------
+# MÉTRICAS POR ETAPA
+# ------------------------------------------
+class Instrumentacion:
+    def __init__(self, archivo_metricas="metricas.jsonl"):
+        os.makedirs(CARPETA_LOGS, exist_ok=True)
+        self.archivo_metricas = os.path.join(CARPETA_LOGS, archivo_metricas)
+        self.carpeta_perfiles = os.path.join(CARPETA_LOGS, "perfiles")
+        self.perfil_cpu = set()
+        self.perfil_memoria = set()
+        self.memoria_iniciada = False
+        self.registros = []
+        self.candado = threading.Lock()
+
+    def configurar(self, perfil_cpu=(), perfil_memoria=()):
+        """
+        Activa cProfile (`perfil_cpu`) o tracemalloc (`perfil_memoria`) para
+        las etapas indicadas, p. ej. {"transformar_calendar"}.
+
+        tracemalloc es global al proceso: se inicia aquí una sola vez y no
+        se reinicia por etapa, porque las colecciones se transforman a la
+        vez. Cada etapa informa la memoria neta que quedó asignada durante
+        el bloque y el pico del proceso hasta ese momento; con etapas en
+        paralelo ambos incluyen lo que asignaron los otros hilos.
+        """
+        self.perfil_cpu = set(perfil_cpu)
+        self.perfil_memoria = set(perfil_memoria)
+        if self.perfil_memoria and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.memoria_iniciada = True
+        elif not self.perfil_memoria and self.memoria_iniciada:
+            tracemalloc.stop()
+            self.memoria_iniciada = False
+
+    def registrar(self, etapa, detalle="", segundos=0.0, filas=0, bytes_=0, **extra):
+        registro = {
+            "tipo": "lote",
+            "fecha": datetime.now().isoformat(),
+            "etapa": etapa,
+            "detalle": detalle,
+            "segundos": round(segundos, 6),
+            "filas": int(filas),
+            "bytes": int(bytes_),
+            "filas_por_segundo": round(filas / segundos, 1) if segundos > 0 else None,
+            "rss_max_mb": rss_maximo_mb(),
+            "pid": os.getpid(),
+            "hilo": threading.current_thread().name,
+        }
+        registro.update(extra)
+        with self.candado:
+            self.registros.append(registro)
+        escritor_log.escribir(self.archivo_metricas, json.dumps(registro, default=str) + "\n")
+        return registro
+
+    @contextmanager
+    def etapa(self, etapa, detalle=""):
+        """
+        Mide el bloque y registra una métrica; dentro del bloque se pueden
+        completar las claves "filas" y "bytes" del diccionario entregado.
+        """
+        datos = {"filas": 0, "bytes": 0}
+        perfil = self.iniciar_perfil(etapa)
+        inicio = time.perf_counter()
+        try:
+            yield datos
+        finally:
+            segundos = time.perf_counter() - inicio
+            extra = self.detener_perfil(etapa, perfil)
+            self.registrar(etapa, detalle, segundos, datos["filas"], datos["bytes"], **extra)
+
+    def medir(self, etapa):
+        """
+        Decorador para métodos que devuelven un DataFrame: registra el tiempo,
+        las filas y los bytes (sin contar objetos Python) del resultado.
+        """
+        def decorador(funcion):
+            @functools.wraps(funcion)
+            def envoltura(*args, **kwargs):
+                with self.etapa(etapa) as datos:
+                    resultado = funcion(*args, **kwargs)
+                    if hasattr(resultado, "memory_usage"):
+                        datos["filas"] = len(resultado)
+                        datos["bytes"] = resultado.memory_usage(index=False).sum()
+                return resultado
+            return envoltura
+        return decorador
+
+    def iniciar_perfil(self, etapa):
+        perfil = {}
+        if etapa in self.perfil_cpu:
+            try:
+                perfil["cpu"] = cProfile.Profile()
+                perfil["cpu"].enable()
+            except ValueError:
+                # Otro perfilador ya está activo (p. ej. en otro hilo)
+                perfil.pop("cpu", None)
+        if etapa in self.perfil_memoria and tracemalloc.is_tracing():
+            perfil["memoria"], _ = tracemalloc.get_traced_memory()
+        return perfil
+
+    def detener_perfil(self, etapa, perfil):
+        extra = {}
+        if "cpu" in perfil:
+            perfil["cpu"].disable()
+            os.makedirs(self.carpeta_perfiles, exist_ok=True)
+            ruta = os.path.join(self.carpeta_perfiles, f"{etapa}_{os.getpid()}_{time.time_ns()}.prof")
+            perfil["cpu"].dump_stats(ruta)
+            extra["perfil_cpu"] = ruta
+        if "memoria" in perfil and tracemalloc.is_tracing():
+            actual, pico = tracemalloc.get_traced_memory()
+            extra["neto_tracemalloc_mb"] = round((actual - perfil["memoria"]) / (1024 * 1024), 2)
+            extra["pico_proceso_tracemalloc_mb"] = round(pico / (1024 * 1024), 2)
+        return extra
+
+    def resumen(self):
+        """
+        Agrega las métricas por etapa, las imprime y escribe una línea
+        {"tipo": "resumen"} en el archivo de métricas.
+        """
+        with self.candado:
+            registros = list(self.registros)
+
+        etapas = {}
+        for registro in registros:
+            total = etapas.setdefault(registro["etapa"], {"lotes": 0, "segundos": 0.0, "filas": 0, "bytes": 0})
+            total["lotes"] += 1
+            total["segundos"] += registro["segundos"]
+            total["filas"] += registro["filas"]
+            total["bytes"] += registro["bytes"]
+        for total in etapas.values():
+            total["segundos"] = round(total["segundos"], 3)
+            total["filas_por_segundo"] = round(total["filas"] / total["segundos"], 1) if total["segundos"] > 0 else None
+
+        resumen = {"tipo": "resumen", "fecha": datetime.now().isoformat(), "rss_max_mb": rss_maximo_mb(), "etapas": etapas}
+        escritor_log.escribir(self.archivo_metricas, json.dumps(resumen) + "\n")
+        escritor_log.vaciar()
+
+        print("\n📈 MÉTRICAS POR ETAPA")
+        for nombre, total in etapas.items():
+            print(f"   {nombre:<24} {total['segundos']:>9.2f}s {total['filas']:>12,} filas "
+                  f"{total['bytes'] / 1e6:>9.1f} MB {total['filas_por_segundo'] or 0:>12,.0f} filas/s")
+        return resumen
+
+
+instrumentacion = Instrumentacion()
@@ -0,0 +1,364 @@
+"""
+Ejecutor del ETL completo: une Extraccion, Transformacion y Carga en un
+pipeline productor/consumidor con colas acotadas, de modo que mientras
+un lote se carga en SQL Server el siguiente se transforma y otro se
+extrae de MongoDB. Las tres colecciones se procesan en paralelo.
+
+Uso:
+    python pipeline.py --servidor "SERVIDOR\\SQLEXPRESS" --usuario sam --password 123
+"""
+
+import argparse
+import os
+import queue
+import threading
+import time
+
+from extraccion import Extraccion
+from transformacion import Transformacion
+from carga import Carga, EscritorExcel
+from cache_transformacion import CacheTransformacion
+from validacion import Validacion
+from estrella import ModeloEstrella
+from instrumentacion import instrumentacion
+
+
+# Marca de fin de datos que se envía por las colas
+FIN = None
+
+
+class Pipeline:
+    # Colección de MongoDB y tabla de SQL Server para cada tipo de dato
+    COLECCIONES = {
+        "listings": ("MX_listings", "listings"),
+        "reviews": ("MX_reviews", "reviews"),
+        "calendar": ("MX_calendar", "calendar"),
+    }
+
+    def __init__(self, uri, database, servidor, base_datos, usuario, password,
+                 tamano_lote=10000, tamano_cola=4, transformadores=1, cargadores=1,
+                 modo="merge", limite=0, carpeta_excel=None, esquema="plano",
+                 cache_transformacion=(), cache_mb=512, validar=True, fecha_scrape=None,
+                 fraccion_perfil=1.0):
+        self.uri = uri
+        self.database = database
+        self.servidor = servidor
+        self.base_datos = base_datos
+        self.usuario = usuario
+        self.password = password
+        self.tamano_lote = tamano_lote
+        self.tamano_cola = tamano_cola
+        self.transformadores = transformadores
+        self.cargadores = cargadores
+        self.modo = modo
+        self.limite = limite
+        self.carpeta_excel = carpeta_excel
+        self.esquema = esquema
+        # En el esquema estrella las tres colecciones comparten dimensiones
+        # (dim_date, dim_listing) y el caché de claves sustitutas
+        self.modelo_estrella = ModeloEstrella() if esquema == "estrella" else None
+        self.candado_estrella = threading.Lock()
+        # Colecciones cuyos lotes pasan por el caché de transformación
+        self.tipos_cache = set(cache_transformacion)
+        self.cache = CacheTransformacion(maximo_mb=cache_mb) if self.tipos_cache else None
+        # Entre la transformación y la carga: reglas, cuarentena y perfil
+        self.validacion = Validacion(fecha_scrape, fraccion_perfil=fraccion_perfil) if validar else None
+
+        self.resumen = {}
+        self.errores = []
+        self.candado_resumen = threading.Lock()
+        # Resúmenes mensuales parciales de calendar, uno por lote
+        self.resumenes_calendar = []
+
+    # ------------------------------------------
+    # EJECUCIÓN
+    # ------------------------------------------
+    def ejecutar(self, tipos=("listings", "reviews", "calendar")):
+        inicio = time.perf_counter()
+        hilos = [threading.Thread(target=self.ejecutar_coleccion, args=(tipo,), name=f"etl-{tipo}") for tipo in tipos]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        duracion = time.perf_counter() - inicio
+        print(f"\n⏱️ Pipeline completado en {duracion:.2f}s")
+        for tipo, filas in self.resumen.items():
+            print(f"   {tipo}: {filas:,} registros cargados")
+        for error in self.errores:
+            print(f"   ❌ {error}")
+        if self.cache is not None:
+            for tipo, datos in self.cache.estadisticas().items():
+                print(f"   🗃️ caché {tipo}: {datos['aciertos']:,} aciertos, {datos['fallos']:,} fallos "
+                      f"({datos['tasa_aciertos'] or 0:.0%})")
+        if self.validacion is not None:
+            self.validacion.resumen()
+        instrumentacion.resumen()
+        return not self.errores
+
+    def ejecutar_coleccion(self, tipo):
+        """
+        Coordina las tres etapas de una colección: cuando termina una etapa
+        envía una marca FIN por cada trabajador de la etapa siguiente.
+        """
+        cola_extraidos = queue.Queue(maxsize=self.tamano_cola)
+        cola_transformados = queue.Queue(maxsize=self.tamano_cola)
+        tabla_lista = threading.Event()
+        # Con dimensiones compartidas, los primeros lotes de todas las
+        # colecciones se serializan para no crear la misma tabla a la vez
+        candado_tabla = self.candado_estrella if self.modelo_estrella else threading.Lock()
+        self.resumen[tipo] = 0
+
+        if self.modo == "reemplazar" and not self.preparar_tabla(tipo):
+            return
+
+        # Los lotes cargados se escriben también en Excel a medida que llegan
+        escritor_excel = None
+        if self.carpeta_excel:
+            os.makedirs(self.carpeta_excel, exist_ok=True)
+            _, tabla = self.COLECCIONES[tipo]
+            escritor_excel = EscritorExcel(self.crear_cargador(), os.path.join(self.carpeta_excel, f"{tabla}.xlsx"))
+
+        extractor = threading.Thread(target=self.extraer, args=(tipo, cola_extraidos))
+        transformadores = [
+            threading.Thread(target=self.transformar, args=(tipo, cola_extraidos, cola_transformados))
+            for _ in range(self.transformadores)
+        ]
+        cargadores = [
+            threading.Thread(target=self.cargar,
+                             args=(tipo, cola_transformados, tabla_lista, candado_tabla, escritor_excel))
+            for _ in range(self.cargadores)
+        ]
+        for hilo in [extractor] + transformadores + cargadores:
+            hilo.start()
+
+        extractor.join()
+        for _ in transformadores:
+            cola_extraidos.put(FIN)
+        for hilo in transformadores:
+            hilo.join()
+        for _ in cargadores:
+            cola_transformados.put(FIN)
+        for hilo in cargadores:
+            hilo.join()
+        if escritor_excel is not None:
+            self.cerrar_excel(tipo, escritor_excel)
+
+        if tipo == "calendar":
+            self.cargar_resumen_calendar()
+
+    def preparar_tabla(self, tipo):
+        # En modo reemplazar la tabla se borra una sola vez al inicio y
+        # luego cada lote se agrega.
+        _, tabla = self.COLECCIONES[tipo]
+        if self.modelo_estrella:
+            # Las dimensiones se mantienen con MERGE; solo se vacían los hechos
+            tabla = ModeloEstrella.HECHOS.get(tipo)
+            if tabla is None:
+                return True
+        cargador = self.crear_cargador()
+        if not cargador.conectar_sqlserver():
+            self.registrar_error(f"{tipo}: sin conexión a SQL Server")
+            return False
+        eliminada = cargador.eliminar_tabla(tabla)
+        cargador.cerrar_conexion()
+        return eliminada
+
+    # ------------------------------------------
+    # ETAPAS
+    # ------------------------------------------
+    def extraer(self, tipo, salida):
+        coleccion, _ = self.COLECCIONES[tipo]
+        transformador = Transformacion()
+        vistos = set()
+        try:
+            extractor = Extraccion(self.uri, self.database)
+            if extractor.conectar_mongodb() is None:
+                self.registrar_error(f"{tipo}: sin conexión a MongoDB")
+                return
+            # Los duplicados entre lotes se filtran aquí, en el único hilo
+            # que ve todos los lotes de la colección en orden.
+            for lote in extractor.iterar_lotes(coleccion, tamano_lote=self.tamano_lote, limite=self.limite):
+                lote = transformador.filtrar_duplicados(lote, tipo, vistos)
+                if not lote.empty:
+                    salida.put(lote)
+        except Exception as e:
+            self.registrar_error(f"{tipo}: error en extracción: {e}")
+
+    def transformar(self, tipo, entrada, salida):
+        transformador = Transformacion()
+        while True:
+            lote = entrada.get()
+            if lote is FIN:
+                return
+            try:
+                if tipo in self.tipos_cache:
+                    transformado = self.cache.transformar(lote, tipo, transformador)
+                else:
+                    transformado = transformador.transformar(lote, tipo, copiar=False)
+                if self.validacion is not None:
+                    transformado = self.validacion.validar(transformado, tipo)
+                if tipo == "calendar":
+                    resumen = transformador.resumir_calendar(transformado)
+                    with self.candado_resumen:
+                        self.resumenes_calendar.append(resumen)
+                salida.put(transformado)
+            except Exception as e:
+                # Se sigue vaciando la cola para no bloquear la extracción
+                self.registrar_error(f"{tipo}: error en transformación: {e}")
+
+    def cargar(self, tipo, entrada, tabla_lista, candado_tabla, escritor_excel=None):
+        _, tabla = self.COLECCIONES[tipo]
+        cargador = self.crear_cargador()
+        conectado = cargador.conectar_sqlserver()
+        if not conectado:
+            self.registrar_error(f"{tipo}: sin conexión a SQL Server")
+
+        while True:
+            lote = entrada.get()
+            if lote is FIN:
+                break
+            if not conectado:
+                continue
+
+            # El primer lote crea la tabla; se serializa para que dos
+            # cargadores no intenten crearla a la vez.
+            if tabla_lista.is_set():
+                exito = self.cargar_lote(cargador, lote, tipo, tabla)
+            else:
+                with candado_tabla:
+                    exito = self.cargar_lote(cargador, lote, tipo, tabla)
+                    if exito:
+                        tabla_lista.set()
+
+            if exito:
+                with self.candado_resumen:
+                    self.resumen[tipo] += len(lote)
+                if escritor_excel is not None:
+                    try:
+                        escritor_excel.escribir(lote)
+                    except Exception as e:
+                        self.registrar_error(f"{tipo}: error al exportar a Excel: {e}")
+            else:
+                self.registrar_error(f"{tipo}: error al cargar un lote de {len(lote)} registros")
+
+        if conectado:
+            cargador.cerrar_conexion()
+
+    def cargar_resumen_calendar(self):
+        # Un mismo listing y mes puede venir en varios lotes: los parciales
+        # se combinan y la tabla de resumen se carga una sola vez al final
+        resumen = Transformacion().combinar_resumenes(self.resumenes_calendar)
+        self.resumenes_calendar = []
+        if resumen.empty:
+            return
+
+        cargador = self.crear_cargador()
+        if not cargador.conectar_sqlserver():
+            self.registrar_error("calendar_mensual: sin conexión a SQL Server")
+            return
+        if cargador.cargar_resumen(resumen, modo=self.modo, tamano_lote=self.tamano_lote):
+            with self.candado_resumen:
+                self.resumen["calendar_mensual"] = len(resumen)
+        else:
+            self.registrar_error(f"calendar_mensual: error al cargar {len(resumen)} registros")
+        if self.carpeta_excel:
+            cargador.exportar_a_excel(resumen, os.path.join(self.carpeta_excel, "calendar_mensual.xlsx"))
+        cargador.cerrar_conexion()
+
+    def cerrar_excel(self, tipo, escritor_excel):
+        try:
+            rutas = escritor_excel.cerrar()
+            if rutas:
+                print(f"📊 {tipo}: {escritor_excel.filas:,} filas exportadas a {', '.join(rutas)}")
+        except Exception as e:
+            self.registrar_error(f"{tipo}: error al guardar el Excel: {e}")
+
+    def cargar_lote(self, cargador, lote, tipo, tabla):
+        # Un error no puede terminar el hilo de carga: la cola acotada de
+        # lotes transformados se llenaría y los transformadores se bloquearían
+        try:
+            return self.cargar_lote_en_tabla(cargador, lote, tipo, tabla)
+        except Exception as e:
+            self.registrar_error(f"{tipo}: error inesperado al cargar: {e}")
+            return False
+
+    def cargar_lote_en_tabla(self, cargador, lote, tipo, tabla):
+        if self.modelo_estrella:
+            return cargador.cargar_estrella(lote, tipo, self.modelo_estrella, modo=self.modo,
+                                            tamano_lote=self.tamano_lote)
+        if self.modo == "merge":
+            return cargador.cargar_con_merge(lote, tabla, tamano_lote=self.tamano_lote)
+        # En modo reemplazar la tabla se vació al empezar: solo se agrega
+        return cargador.cargar_incremental(lote, tabla, tamano_lote=self.tamano_lote, solo_agregar=True)
+
+    def crear_cargador(self):
+        # El pool de SQL Server se comparte entre todos los cargadores del
+        # proceso; se dimensiona para los cargadores de las tres colecciones
+        # más la conexión que prepara las tablas.
+        tamano_pool = self.cargadores * len(self.COLECCIONES) + 1
+        return Carga(self.servidor, self.base_datos, self.usuario, self.password, tamano_pool=tamano_pool)
+
+    def registrar_error(self, mensaje):
+        with self.candado_resumen:
+            self.errores.append(mensaje)
+        print(f"❌ {mensaje}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pipeline ETL Airbnb: MongoDB → Transformación → SQL Server")
+    parser.add_argument("--uri", default="mongodb://localhost:27017/")
+    parser.add_argument("--database", default="MX_DB")
+    parser.add_argument("--servidor", required=True)
+    parser.add_argument("--base-datos", default="Airbnb_DW")
+    parser.add_argument("--usuario", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--colecciones", nargs="+", default=list(Pipeline.COLECCIONES),
+                        choices=list(Pipeline.COLECCIONES))
+    parser.add_argument("--tamano-lote", type=int, default=10000)
+    parser.add_argument("--tamano-cola", type=int, default=4, help="Lotes en espera entre etapas")
+    parser.add_argument("--transformadores", type=int, default=1, help="Hilos de transformación por colección")
+    parser.add_argument("--cargadores", type=int, default=1, help="Conexiones de carga por colección")
+    parser.add_argument("--modo", choices=["merge", "reemplazar"], default="merge")
+    parser.add_argument("--limite", type=int, default=0)
+    parser.add_argument("--cache-transformacion", nargs="*", default=[], choices=list(Pipeline.COLECCIONES),
+                        metavar="COLECCION", help="Colecciones cuyas filas sin cambios se leen del caché en disco")
+    parser.add_argument("--cache-mb", type=int, default=512, help="Tamaño máximo del caché de transformación")
+    parser.add_argument("--sin-validacion", action="store_true", help="No validar los lotes antes de cargarlos")
+    parser.add_argument("--fecha-scrape", default=None, metavar="AAAA-MM-DD",
+                        help="Fecha del scrape de Inside Airbnb; acota la ventana de fechas válidas")
+    parser.add_argument("--fraccion-perfil", type=float, default=1.0,
+                        help="Fracción de lotes usada para el perfil aproximado de calidad")
+    parser.add_argument("--esquema", choices=["plano", "estrella"], default="plano",
+                        help="estrella: dimensiones y hechos con claves sustitutas en lugar de tablas planas")
+    parser.add_argument("--excel", default=None, metavar="CARPETA",
+                        help="Exporta también cada tabla a CARPETA/<tabla>.xlsx mientras se carga")
+    parser.add_argument("--perfil-cpu", nargs="*", default=[], metavar="ETAPA",
+                        help="Etapas a perfilar con cProfile (p. ej. transformar_calendar carga)")
+    parser.add_argument("--perfil-memoria", nargs="*", default=[], metavar="ETAPA",
+                        help="Etapas a medir con tracemalloc")
+    args = parser.parse_args()
+
+    instrumentacion.configurar(perfil_cpu=args.perfil_cpu, perfil_memoria=args.perfil_memoria)
+
+    print("=" * 70)
+    print("🚀 INICIANDO PIPELINE ETL")
+    print("=" * 70)
+
+    pipeline = Pipeline(
+        args.uri, args.database, args.servidor, args.base_datos, args.usuario, args.password,
+        tamano_lote=args.tamano_lote, tamano_cola=args.tamano_cola,
+        transformadores=args.transformadores, cargadores=args.cargadores,
+        modo=args.modo, limite=args.limite, carpeta_excel=args.excel, esquema=args.esquema,
+        cache_transformacion=args.cache_transformacion, cache_mb=args.cache_mb,
+        validar=not args.sin_validacion, fecha_scrape=args.fecha_scrape, fraccion_perfil=args.fraccion_perfil,
+    )
+    # Código de salida distinto de 0 si alguna etapa falló, para las ejecuciones programadas
+    raise SystemExit(0 if pipeline.ejecutar(args.colecciones) else 1)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n⚠️  Proceso interrumpido por el usuario.")
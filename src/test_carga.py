@@ -3,7 +3,6 @@ Script de prueba para la clase Carga.
 Prueba la conexión a SQL Server y carga de datos transformados.
 """
 
-import pandas as pd
 from carga import Carga
 
 
@@ -34,16 +33,19 @@ def main():
     print("\n📦 PASO 1: Cargando datos transformados del test...")
     print("-" * 70)
     
+    cargador = Carga(SERVER, DATABASE, USERNAME, PASSWORD)
+
     try:
-        df_listings = pd.read_csv("test_listings_transformado.csv")
-        df_reviews = pd.read_csv("test_reviews_transformado.csv")
-        df_calendar = pd.read_csv("test_calendar_transformado.csv")
+        df_listings = cargador.leer_parquet("test_listings_transformado.parquet")
+        df_reviews = cargador.leer_parquet("test_reviews_transformado.parquet")
+        df_calendar = cargador.leer_parquet("test_calendar_transformado.parquet")
+        df_calendar_mensual = cargador.leer_parquet("test_calendar_mensual.parquet")
         
         print(f"✅ Listings cargados: {len(df_listings)} registros")
         print(f"✅ Reviews cargados: {len(df_reviews)} registros")
         print(f"✅ Calendar cargados: {len(df_calendar)} registros")
     except FileNotFoundError as e:
-        print(f"❌ Error: No se encontraron los archivos CSV del test")
+        print(f"❌ Error: No se encontraron los archivos Parquet del test")
         print(f"   Ejecuta primero: python src/test_transformacion.py")
         return
     
@@ -53,8 +55,6 @@ def main():
     print("\n🔌 PASO 2: Conectando a SQL Server...")
     print("-" * 70)
     
-    cargador = Carga(SERVER, DATABASE, USERNAME, PASSWORD)
-    
     if not cargador.conectar_sqlserver():
         print("❌ Error: No se pudo conectar a SQL Server")
         print("\n💡 Verifica:")
@@ -89,11 +89,19 @@ def main():
     
     # Cargar Calendar
     print("\n📅 Cargando tabla 'calendar'...")
-    if cargador.cargar_a_sqlserver(df_calendar, "calendar"):
+    if cargador.cargar_a_sqlserver(df_calendar, "calendar", columnas_indice=["listing_id", "date"]):
         count = cargador.verificar_carga("calendar")
         print(f"✅ Tabla 'calendar' creada con {count} registros")
     else:
         print("❌ Error al cargar 'calendar'")
+
+    # Cargar resumen mensual de Calendar
+    print("\n📈 Cargando tabla 'calendar_mensual'...")
+    if cargador.cargar_resumen(df_calendar_mensual, "calendar_mensual"):
+        count = cargador.verificar_carga("calendar_mensual")
+        print(f"✅ Tabla 'calendar_mensual' creada con {count} registros")
+    else:
+        print("❌ Error al cargar 'calendar_mensual'")
     
     # ==========================================
     # PASO 4: EXPORTAR A EXCEL
@@ -105,15 +113,14 @@ def main():
     import os
     os.makedirs("data", exist_ok=True)
     
-    # Exportar cada tabla
-    if cargador.exportar_a_excel(df_listings, "data/listings_transformado.xlsx"):
-        print("✅ data/listings_transformado.xlsx")
-    
-    if cargador.exportar_a_excel(df_reviews, "data/reviews_transformado.xlsx"):
-        print("✅ data/reviews_transformado.xlsx")
-    
-    if cargador.exportar_a_excel(df_calendar, "data/calendar_transformado.xlsx"):
-        print("✅ data/calendar_transformado.xlsx")
+    # Exportar las tres tablas en paralelo (una por proceso)
+    exportadas = cargador.exportar_tablas_a_excel({
+        "listings_transformado": df_listings,
+        "reviews_transformado": df_reviews,
+        "calendar_transformado": df_calendar,
+    }, "data")
+    for nombre, exito in exportadas.items():
+        print(f"{'✅' if exito else '❌'} data/{nombre}.xlsx")
     
     # ==========================================
     # PASO 5: RESUMEN FINAL
@@ -129,6 +136,7 @@ def main():
     print("   ✅ listings")
     print("   ✅ reviews")
     print("   ✅ calendar")
+    print("   ✅ calendar_mensual")
     print("\n📁 Archivos Excel generados en 'data/':")
     print("   ✅ listings_transformado.xlsx")
     print("   ✅ reviews_transformado.xlsx")
@@ -142,7 +150,7 @@ def main():
     print("   1. Abrir SQL Server Management Studio")
     print(f"   2. Conectar a: {SERVER}")
     print(f"   3. Ver la base de datos: {DATABASE}")
-    print("   4. Consultar las tablas: listings, reviews, calendar")
+    print("   4. Consultar las tablas: listings, reviews, calendar, calendar_mensual")
     
     # Cerrar conexión
     cargador.cerrar_conexion()
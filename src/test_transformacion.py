@@ -1,6 +1,7 @@
 import pandas as pd
 from extraccion import Extraccion
 from transformacion import Transformacion
+from validacion import Validacion
 
 
 def mostrar_comparacion(df_antes, df_despues, nombre):
@@ -81,18 +82,31 @@ def main():
     df_calendar_transformado = transformador.transformar_calendar(df_calendar_original)
     mostrar_comparacion(df_calendar_original, df_calendar_transformado, "CALENDAR")
 
+    print("\n🔎 Validando datos transformados...")
+    validacion = Validacion(nombre_archivo_log="test_transformacion_log.txt")
+    df_listings_transformado = validacion.validar(df_listings_transformado, "listings")
+    df_reviews_transformado = validacion.validar(df_reviews_transformado, "reviews")
+    df_calendar_transformado = validacion.validar(df_calendar_transformado, "calendar")
+    validacion.resumen()
+
+    print("\n📈 Resumiendo CALENDAR por listing y mes...")
+    df_calendar_mensual = transformador.resumir_calendar(df_calendar_transformado)
+    print(df_calendar_mensual.head(3).to_string())
+
     # --------------------------------------------
     # PASO 3: GUARDAR RESULTADOS PARA CARGA
     # --------------------------------------------
     print("\n💾 Guardando resultados transformados...")
-    df_listings_transformado.to_csv("test_listings_transformado.csv", index=False)
-    df_reviews_transformado.to_csv("test_reviews_transformado.csv", index=False)
-    df_calendar_transformado.to_csv("test_calendar_transformado.csv", index=False)
-
-    print("\n✅ Archivos CSV generados:")
-    print("   - test_listings_transformado.csv")
-    print("   - test_reviews_transformado.csv")
-    print("   - test_calendar_transformado.csv")
+    transformador.guardar_parquet(df_listings_transformado, "test_listings_transformado.parquet")
+    transformador.guardar_parquet(df_reviews_transformado, "test_reviews_transformado.parquet")
+    transformador.guardar_parquet(df_calendar_transformado, "test_calendar_transformado.parquet")
+    transformador.guardar_parquet(df_calendar_mensual, "test_calendar_mensual.parquet")
+
+    print("\n✅ Archivos Parquet generados:")
+    print("   - test_listings_transformado.parquet")
+    print("   - test_reviews_transformado.parquet")
+    print("   - test_calendar_transformado.parquet")
+    print("   - test_calendar_mensual.parquet")
 
     print("\n" + "="*70)
     print("✨ TRANSFORMACIÓN COMPLETADA EXITOSAMENTE")
@@ -1,7 +1,12 @@
 import pandas as pd
 import numpy as np
 import os
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from instrumentacion import escritor_log, instrumentacion
 
 
 class Transformacion:
@@ -10,6 +15,16 @@ class Transformacion:
     a los datos extraídos de MongoDB para Airbnb.
     """
 
+    # Claves usadas para eliminar duplicados en cada colección
+    CLAVES_DUPLICADOS = {
+        "listings": ["_id"],
+        "reviews": ["_id"],
+        "calendar": ["listing_id", "date"],
+    }
+
+    # Enteros que no se reducen a int32 (además de los terminados en _id)
+    COLUMNAS_INT64 = ("id", "comment_hash")
+
     def __init__(self, nombre_archivo_log="logs_transformacion.txt"):
         ruta_base = os.path.dirname(os.path.abspath(__file__))
         carpeta_logs = os.path.join(ruta_base, "Logs")
@@ -21,22 +36,223 @@ class Transformacion:
     # ------------------------------------------
     def registrar_log(self, mensaje):
         try:
-            with open(self.archivo_log, "a", encoding="utf-8") as log:
-                log.write(f"{datetime.now().isoformat()} | {mensaje}\n")
+            escritor_log.escribir(self.archivo_log, f"{datetime.now().isoformat()} | {mensaje}\n")
         except Exception as e:
             print(f"No se pudo escribir el log: {e}")
 
+    # ------------------------------------------
+    # UTILIDAD: LIMPIAR PRECIOS
+    # ------------------------------------------
+    def limpiar_precio(self, serie):
+        """
+        Convierte precios con formato "$1,234.00" a float. Las columnas que ya
+        son numéricas se devuelven tal cual, y el texto se procesa solo sobre
+        los valores únicos (los precios de calendar se repiten mucho) antes
+        de volver a expandirlo con los códigos de factorize. Los valores
+        inválidos quedan como NaN, también "inf" o "nan", que to_numeric
+        sí acepta pero no caben en un DECIMAL.
+        """
+        if pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie):
+            return serie.astype(float).where(lambda valores: np.isfinite(valores))
+
+        codigos, unicos = pd.factorize(serie)
+        texto = pd.Series(unicos, dtype=object).astype(str)
+
+        # Camino rápido: quitar "$" y "," sin expresiones regulares
+        valores = pd.to_numeric(
+            texto.str.replace("$", "", regex=False).str.replace(",", "", regex=False).str.strip(),
+            errors="coerce",
+        )
+
+        # Los que no cumplen el formato conocido pasan por la limpieza general
+        pendientes = valores.isna()
+        if pendientes.any():
+            valores[pendientes] = pd.to_numeric(
+                texto[pendientes].str.replace("[^0-9.]", "", regex=True),
+                errors="coerce",
+            )
+
+        valores = valores.to_numpy(dtype=float, copy=True)
+        valores[~np.isfinite(valores)] = np.nan
+        resultado = np.append(valores, np.nan)[codigos]
+        return pd.Series(resultado, index=serie.index, name=serie.name)
+
+    # ------------------------------------------
+    # UTILIDAD: CONVERTIR FECHAS
+    # ------------------------------------------
+    def convertir_fecha(self, serie, formato="%Y-%m-%d", nombre=""):
+        """
+        Convierte texto a datetime procesando solo los valores únicos (las
+        fechas de calendar son pocos días repetidos en cada listing) y
+        expandiéndolos con los códigos de factorize. Primero se usa el
+        formato ISO explícito; solo los valores que no lo cumplen pasan por
+        la inferencia de formato. Los valores inválidos quedan como NaT y se
+        informa cuántos fueron.
+        """
+        if pd.api.types.is_datetime64_any_dtype(serie):
+            return serie
+
+        codigos, unicos = pd.factorize(serie)
+        texto = pd.Series(unicos, dtype=object)
+
+        # Camino rápido: formato ISO sin inferencia
+        fechas = pd.to_datetime(texto, format=formato, errors="coerce")
+
+        # Los que no cumplen el formato (p. ej. con hora) pasan por la inferencia;
+        # los que traen zona horaria se pasan a UTC sin zona como el resto
+        pendientes = fechas.isna()
+        if pendientes.any():
+            inferidas = pd.to_datetime(texto[pendientes].astype(str), format="mixed", errors="coerce", utc=True)
+            fechas[pendientes] = inferidas.dt.tz_convert(None)
+
+        resultado = pd.Series(np.append(fechas.to_numpy(), np.datetime64("NaT"))[codigos],
+                              index=serie.index, name=serie.name)
+
+        invalidos = int(resultado.isna().sum() - serie.isna().sum())
+        if invalidos:
+            print(f"⚠️ {nombre or serie.name}: {invalidos} fechas inválidas convertidas a NaT")
+            self.registrar_log(f"{nombre or serie.name}: {invalidos} fechas inválidas convertidas a NaT")
+        return resultado
+
+    # ------------------------------------------
+    # UTILIDAD: CARACTERÍSTICAS DE TEXTO
+    # ------------------------------------------
+    # Escrituras que se distinguen en los comentarios. Solo se buscan en los
+    # textos con algún carácter de ellas; el orden decide cuando un texto
+    # mezcla varias (p. ej. japonés con palabras en inglés).
+    ESCRITURAS = {
+        "cjk": r"[\p{Han}\p{Hiragana}\p{Katakana}\p{Hangul}]",
+        "cirilico": r"\p{Cyrillic}",
+        "arabe": r"\p{Arabic}",
+    }
+    PUNTUACION_EXTREMOS = ".,;:!?¡¿\"'()[]-…*~ "
+
+    def caracteristicas_texto(self, serie):
+        """
+        Calcula las características de un texto libre con kernels de
+        pyarrow.compute sobre toda la columna, sin llamadas de Python por
+        fila. Devuelve un DataFrame con el mismo índice y las columnas:
+
+        - texto: sin etiquetas <br/> y sin espacios al inicio y al final
+        - longitud: caracteres del texto limpio
+        - palabras: cantidad de palabras separadas por espacios
+        - escritura: pista del alfabeto (latino, cjk, cirilico, arabe, otro, vacio)
+        - hash: hash del texto normalizado (minúsculas, espacios simples y sin
+          puntuación en los extremos) para detectar comentarios duplicados
+        """
+        try:
+            # Sin copia cuando la columna ya es texto respaldado por Arrow
+            texto = pa.array(serie, from_pandas=True).cast(pa.large_string())
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            texto = pa.array(serie.where(serie.isna(), serie.astype(str)), type=pa.large_string(), from_pandas=True)
+        texto = pc.fill_null(texto, "")
+
+        # La expresión regular solo se aplica a los textos que tienen "<br"
+        con_br = pc.match_substring(texto, "<br", ignore_case=True)
+        if pc.any(con_br).as_py():
+            texto = pc.if_else(con_br, pc.replace_substring_regex(texto, r"(?i)<br\s*/?>", " "), texto)
+        texto = pc.utf8_trim_whitespace(texto)
+
+        longitud = pc.utf8_length(texto).to_numpy()
+        tokens = pc.utf8_split_whitespace(pc.utf8_lower(texto))
+        palabras = np.where(longitud == 0, 0, pc.list_value_length(tokens).to_numpy())
+
+        etiquetas = ["latino"] + list(self.ESCRITURAS) + ["otro", "vacio"]
+        codigos = np.where(pc.match_substring_regex(texto, r"\p{Latin}").to_numpy(zero_copy_only=False), 0, 4)
+        no_latinos = pc.match_substring_regex(texto, "|".join(self.ESCRITURAS.values())).to_numpy(zero_copy_only=False)
+        if no_latinos.any():
+            posiciones = np.flatnonzero(no_latinos)
+            candidatos = texto.take(posiciones)
+            asignados = np.zeros(len(posiciones), dtype=bool)
+            for codigo, patron in enumerate(self.ESCRITURAS.values(), start=1):
+                coincide = pc.match_substring_regex(candidatos, patron).to_numpy(zero_copy_only=False) & ~asignados
+                codigos[posiciones[coincide]] = codigo
+                asignados |= coincide
+        codigos[longitud == 0] = 5
+        escritura = pd.Categorical.from_codes(codigos, categories=etiquetas)
+
+        normalizado = pc.utf8_trim(pc.binary_join(tokens, pa.scalar(" ", pa.large_string())),
+                                   characters=self.PUNTUACION_EXTREMOS)
+        # SQL Server no tiene enteros sin signo: el hash se guarda como BIGINT
+        hashes = pd.util.hash_pandas_object(normalizado.to_pandas(), index=False).to_numpy().view(np.int64)
+
+        return pd.DataFrame({
+            "texto": texto.to_pandas().array,
+            "longitud": longitud.astype(np.int32),
+            "palabras": palabras.astype(np.int32),
+            "escritura": escritura,
+            "hash": hashes,
+        }, index=serie.index)
+
+    # ------------------------------------------
+    # UTILIDAD: COMPACTAR TIPOS DE DATOS
+    # ------------------------------------------
+    def optimizar_tipos(self, df, nombre, umbral_categoria=0.5):
+        """
+        Reduce la memoria del DataFrame transformado: enteros a int32/int64,
+        float a float32 cuando no se pierde precisión al centavo, booleanos
+        con nulos a `boolean`, texto de baja cardinalidad a `category` y
+        `fecha_transformacion` (un único valor repetido) a `category`.
+        """
+        memoria_antes = df.memory_usage(deep=True).sum()
+
+        for col in df.columns:
+            serie = df[col]
+            if isinstance(serie.dtype, pd.CategoricalDtype) or pd.api.types.is_bool_dtype(serie):
+                continue
+
+            if col == "fecha_transformacion":
+                df[col] = serie.astype("category")
+            elif pd.api.types.is_integer_dtype(serie):
+                df[col] = self.reducir_entero(serie, col)
+            elif pd.api.types.is_float_dtype(serie):
+                reducida = serie.astype("float32")
+                if np.allclose(reducida.to_numpy(dtype=float), serie.to_numpy(dtype=float),
+                               rtol=0, atol=0.005, equal_nan=True):
+                    df[col] = reducida
+            elif serie.dtype == object or pd.api.types.is_string_dtype(serie):
+                tipo = pd.api.types.infer_dtype(serie, skipna=True)
+                if tipo == "boolean":
+                    df[col] = serie.astype("boolean")
+                elif tipo == "integer":
+                    df[col] = self.reducir_entero(pd.to_numeric(serie), col)
+                elif tipo == "string" and serie.nunique() <= len(serie) * umbral_categoria:
+                    df[col] = serie.astype("category")
+
+        memoria_despues = df.memory_usage(deep=True).sum()
+        factor = memoria_antes / memoria_despues if memoria_despues else 0
+        print(f"📉 {nombre}: memoria {memoria_antes / 1e6:.2f} MB → {memoria_despues / 1e6:.2f} MB ({factor:.1f}x)")
+        self.registrar_log(
+            f"{nombre} memoria: {memoria_antes / 1e6:.2f} MB -> {memoria_despues / 1e6:.2f} MB ({factor:.1f}x)"
+        )
+        return df
+
+    def reducir_entero(self, serie, nombre=""):
+        # Ids, claves y hashes van siempre a int64: Airbnb tiene ids viejos
+        # chicos y nuevos de 18 dígitos, y el tipo de salida no puede
+        # depender de qué ids trae cada lote. Solo las medidas acotadas
+        # (noches, conteos) bajan a int32 si caben. Con nulos se usa la
+        # versión nullable (Int32/Int64).
+        limites = np.iinfo(np.int32)
+        es_id = nombre in self.COLUMNAS_INT64 or str(nombre).endswith("_id")
+        cabe_en_32 = not es_id and serie.dropna().between(limites.min, limites.max).all()
+        if serie.isna().any():
+            return serie.astype("Int32" if cabe_en_32 else "Int64")
+        return serie.astype("int32" if cabe_en_32 else "int64")
+
     # ------------------------------------------
     # TRANSFORMACIÓN DE LISTINGS
     # ------------------------------------------
-    def transformar_listings(self, df):
+    @instrumentacion.medir("transformar_listings")
+    def transformar_listings(self, df, copiar=True, optimizar=True):
         if df.empty:
             print("⚠️ No hay datos en LISTINGS para transformar")
             return df
 
         self.registrar_log("Inicio transformación de LISTINGS")
 
-        df = df.copy()
+        if copiar:
+            df = df.copy()
 
         # Eliminar duplicados por _id
         if "_id" in df.columns:
@@ -44,12 +260,7 @@ class Transformacion:
         
         # Normalizar columnas numéricas
         if "price" in df.columns:
-            df["price"] = (
-                df["price"].astype(str)
-                .str.replace("[^0-9.]", "", regex=True)
-                .replace("", np.nan)
-                .astype(float)
-            )
+            df["price"] = self.limpiar_precio(df["price"])
 
         # Rellenar nulos
         for col in ["bedrooms", "beds", "bathrooms_text"]:
@@ -58,25 +269,31 @@ class Transformacion:
 
         # Convertir host_since a datetime
         if "host_since" in df.columns:
-            df["host_since"] = pd.to_datetime(df["host_since"], errors="coerce")
+            df["host_since"] = self.convertir_fecha(df["host_since"], nombre="LISTINGS host_since")
 
         # Agregar columna de timestamp de transformación
         df["fecha_transformacion"] = datetime.now()
 
+        # Compactar tipos de datos
+        if optimizar:
+            df = self.optimizar_tipos(df, "LISTINGS")
+
         self.registrar_log(f"LISTINGS transformado: {len(df)} registros finales")
         return df
 
     # ------------------------------------------
     # TRANSFORMACIÓN DE REVIEWS
     # ------------------------------------------
-    def transformar_reviews(self, df):
+    @instrumentacion.medir("transformar_reviews")
+    def transformar_reviews(self, df, copiar=True, optimizar=True):
         if df.empty:
             print("⚠️ No hay datos en REVIEWS para transformar")
             return df
 
         self.registrar_log("Inicio transformación de REVIEWS")
 
-        df = df.copy()
+        if copiar:
+            df = df.copy()
 
         # Eliminar duplicados
         if "_id" in df.columns:
@@ -84,32 +301,39 @@ class Transformacion:
 
         # Convertir fechas
         if "date" in df.columns:
-            df["date"] = pd.to_datetime(df["date"], errors="coerce")
+            df["date"] = self.convertir_fecha(df["date"], nombre="REVIEWS date")
 
-        # Limpiar comentarios
+        # Limpiar comentarios y agregar sus características de texto
         if "comments" in df.columns:
-            df["comments"] = df["comments"].fillna("").astype(str).str.strip()
-
-        # Agregar columna de longitud del comentario
-        if "comments" in df.columns:
-            df["comment_length"] = df["comments"].apply(len)
+            texto = self.caracteristicas_texto(df["comments"])
+            df["comments"] = texto["texto"]
+            df["comment_length"] = texto["longitud"]
+            df["comment_words"] = texto["palabras"]
+            df["comment_script"] = texto["escritura"]
+            df["comment_hash"] = texto["hash"]
 
         df["fecha_transformacion"] = datetime.now()
 
+        # Compactar tipos de datos
+        if optimizar:
+            df = self.optimizar_tipos(df, "REVIEWS")
+
         self.registrar_log(f"REVIEWS transformado: {len(df)} registros finales")
         return df
 
     # ------------------------------------------
     # TRANSFORMACIÓN DE CALENDAR
     # ------------------------------------------
-    def transformar_calendar(self, df):
+    @instrumentacion.medir("transformar_calendar")
+    def transformar_calendar(self, df, copiar=True, optimizar=True):
         if df.empty:
             print("⚠️ No hay datos en CALENDAR para transformar")
             return df
 
         self.registrar_log("Inicio transformación de CALENDAR")
 
-        df = df.copy()
+        if copiar:
+            df = df.copy()
 
         # Eliminar duplicados por listing_id + date
         if "listing_id" in df.columns and "date" in df.columns:
@@ -117,17 +341,12 @@ class Transformacion:
 
         # Convertir fecha
         if "date" in df.columns:
-            df["date"] = pd.to_datetime(df["date"], errors="coerce")
+            df["date"] = self.convertir_fecha(df["date"], nombre="CALENDAR date")
 
         # Limpiar precios
         for col in ["price", "adjusted_price"]:
             if col in df.columns:
-                df[col] = (
-                    df[col].astype(str)
-                    .str.replace("[^0-9.]", "", regex=True)
-                    .replace("", np.nan)
-                    .astype(float)
-                )
+                df[col] = self.limpiar_precio(df[col])
 
         # Convertir disponibilidad a booleano
         if "available" in df.columns:
@@ -136,5 +355,284 @@ class Transformacion:
         # Agregar columna de transformación
         df["fecha_transformacion"] = datetime.now()
 
+        # Compactar tipos de datos
+        if optimizar:
+            df = self.optimizar_tipos(df, "CALENDAR")
+
         self.registrar_log(f"CALENDAR transformado: {len(df)} registros finales")
         return df
+
+    # ------------------------------------------
+    # RESUMEN MENSUAL DE CALENDAR
+    # ------------------------------------------
+    # Columnas parciales que se pueden volver a sumar entre lotes, y cómo
+    AGREGADOS_RESUMEN = {
+        "noches": "sum",
+        "noches_disponibles": "sum",
+        "noches_con_precio": "sum",
+        "suma_precio": "sum",
+        "precio_min": "min",
+        "precio_max": "max",
+    }
+
+    def resumir_calendar(self, df):
+        """
+        Agrega un calendar ya transformado por listing_id y mes (primer día
+        del mes) con un groupby vectorizado: noches, noches disponibles,
+        tasa de ocupación (noches no disponibles / noches) y precio medio,
+        mínimo y máximo. Las columnas parciales (sumas y conteos) se
+        conservan para que los resúmenes de varios lotes se puedan unir con
+        `combinar_resumenes`.
+        """
+        if df.empty or not {"listing_id", "date", "available", "price"}.issubset(df.columns):
+            return pd.DataFrame()
+
+        # Las filas medidas son las del calendar leído, no las del resumen
+        with instrumentacion.etapa("resumir_calendar") as datos:
+            precio = df["price"].astype("float64")
+            base = pd.DataFrame({
+                "listing_id": df["listing_id"].to_numpy(),
+                # Truncar a mes en numpy es mucho más rápido que pasar por Period
+                "mes": df["date"].to_numpy().astype("datetime64[M]").astype(df["date"].dtype),
+                "disponible": df["available"].fillna(False).to_numpy(dtype=np.int8),
+                "price": precio.to_numpy(),
+            })
+            grupos = base.groupby(["listing_id", "mes"], sort=True)
+            resumen = pd.DataFrame({
+                "noches": grupos.size(),
+                "noches_disponibles": grupos["disponible"].sum(),
+                "noches_con_precio": grupos["price"].count(),
+                "suma_precio": grupos["price"].sum(),
+                "precio_min": grupos["price"].min(),
+                "precio_max": grupos["price"].max(),
+            }).reset_index()
+            datos["filas"] = len(df)
+            datos["bytes"] = base.memory_usage(index=False).sum()
+        return self.completar_resumen(resumen)
+
+    def combinar_resumenes(self, resumenes):
+        """
+        Une los resúmenes parciales de varios lotes (un mismo listing y mes
+        puede quedar repartido entre lotes) y recalcula las tasas y medias.
+        """
+        resumenes = [resumen for resumen in resumenes if not resumen.empty]
+        if not resumenes:
+            return pd.DataFrame()
+
+        resumen = pd.concat(resumenes, ignore_index=True)
+        resumen = resumen.groupby(["listing_id", "mes"], sort=True).agg(self.AGREGADOS_RESUMEN).reset_index()
+        return self.completar_resumen(resumen)
+
+    def completar_resumen(self, resumen):
+        noches = resumen["noches"].to_numpy(dtype=float)
+        con_precio = resumen["noches_con_precio"].to_numpy(dtype=float)
+        resumen["noches"] = resumen["noches"].astype(np.int32)
+        resumen["noches_disponibles"] = resumen["noches_disponibles"].astype(np.int32)
+        resumen["noches_con_precio"] = resumen["noches_con_precio"].astype(np.int32)
+        resumen["tasa_ocupacion"] = np.round(1 - resumen["noches_disponibles"].to_numpy() / noches, 4)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            resumen["precio_medio"] = np.round(
+                np.where(con_precio > 0, resumen["suma_precio"].to_numpy() / con_precio, np.nan), 2
+            )
+        resumen["fecha_transformacion"] = datetime.now()
+        return resumen
+
+    # ------------------------------------------
+    # TRANSFORMACIÓN POR LOTES (STREAMING)
+    # ------------------------------------------
+    def transformar_lotes(self, lotes, tipo):
+        """
+        Recibe un iterador de DataFrames (p. ej. Extraccion.iterar_lotes) y
+        devuelve los lotes transformados uno a uno. Las claves ya vistas se
+        guardan en un conjunto para que la eliminación de duplicados siga
+        siendo correcta entre lotes.
+        """
+        vistos = set()
+        total = 0
+
+        for lote in lotes:
+            filtrado = self.filtrar_duplicados(lote, tipo, vistos)
+            if filtrado.empty:
+                continue
+
+            # Si hubo filtrado el lote ya es una copia propia
+            filtrado = self.transformar(filtrado, tipo, copiar=filtrado is lote)
+            total += len(filtrado)
+            yield filtrado
+
+        self.registrar_log(f"{tipo.upper()} transformado por lotes: {total} registros finales")
+
+    def transformar(self, df, tipo, copiar=True):
+        transformaciones = {
+            "listings": self.transformar_listings,
+            "reviews": self.transformar_reviews,
+            "calendar": self.transformar_calendar,
+        }
+        return transformaciones[tipo](df, copiar=copiar)
+
+    def filtrar_duplicados(self, lote, tipo, vistos):
+        """
+        Quita del lote las filas cuya clave ya apareció en este lote o en
+        lotes anteriores (`vistos`) y agrega las claves nuevas al conjunto.
+        """
+        columnas_clave = self.CLAVES_DUPLICADOS[tipo]
+        if not all(col in lote.columns for col in columnas_clave):
+            return lote
+
+        if len(columnas_clave) == 1:
+            claves = lote[columnas_clave[0]]
+        else:
+            claves = pd.Series(list(zip(*(lote[col] for col in columnas_clave))), index=lote.index)
+        nuevas = ~claves.isin(vistos) & ~claves.duplicated()
+        vistos.update(claves[nuevas])
+        return lote[nuevas.to_numpy()]
+
+    # ------------------------------------------
+    # TRANSFORMACIÓN EN PARALELO (VARIOS NÚCLEOS)
+    # ------------------------------------------
+    def transformar_paralelo(self, df, tipo, procesos=None, particiones=None):
+        """
+        Parte el DataFrame por hash de la clave de duplicados (listing_id en
+        calendar, _id en listings y reviews), transforma cada partición en un
+        pool de procesos y une los resultados en el orden original. Como
+        todas las filas de una misma clave caen en la misma partición, la
+        eliminación de duplicados sigue siendo correcta.
+
+        Las particiones viajan entre procesos como buffers Arrow IPC en lugar
+        de DataFrames serializados con pickle; por eso las columnas que Arrow
+        no conoce (ObjectId) llegan como texto.
+        """
+        procesos = procesos or os.cpu_count() or 1
+        particiones = particiones or procesos
+        if df.empty or procesos <= 1 or len(df) < particiones:
+            return self.transformar(df, tipo)
+
+        columna = self.CLAVES_DUPLICADOS[tipo][0]
+        if columna in df.columns:
+            grupos = pd.util.hash_pandas_object(df[columna], index=False).to_numpy() % particiones
+        else:
+            grupos = np.arange(len(df)) % particiones
+
+        tareas = [
+            (self.a_arrow(df[grupos == i]), tipo, self.archivo_log)
+            for i in range(particiones) if (grupos == i).any()
+        ]
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            partes = [self.desde_arrow(buffer) for buffer in pool.map(_transformar_particion, tareas)]
+
+        resultado = self.unir_partes(partes)
+        self.registrar_log(f"{tipo.upper()} transformado en paralelo: {len(resultado)} registros, {len(tareas)} particiones")
+        return resultado
+
+    def unir_partes(self, partes):
+        """
+        Une partes transformadas por separado en el orden de su índice. Cada
+        parte tiene sus propias categorías; al unirlas quedan como object y
+        se vuelven a convertir, y `fecha_transformacion` queda con un solo
+        valor para todo el resultado.
+        """
+        resultado = pd.concat(partes).sort_index()
+
+        for col in partes[0].columns:
+            if isinstance(partes[0][col].dtype, pd.CategoricalDtype) and not isinstance(resultado[col].dtype, pd.CategoricalDtype):
+                resultado[col] = resultado[col].astype("category")
+        if "fecha_transformacion" in resultado.columns:
+            resultado["fecha_transformacion"] = pd.Categorical.from_codes(
+                np.zeros(len(resultado), dtype=np.int8), categories=pd.DatetimeIndex([datetime.now()])
+            )
+        return resultado
+
+    def a_arrow(self, df):
+        tabla = pa.Table.from_pandas(self.preparar_para_arrow(df), preserve_index=True)
+        salida = pa.BufferOutputStream()
+        with pa.ipc.new_stream(salida, tabla.schema) as escritor:
+            escritor.write_table(tabla)
+        return salida.getvalue()
+
+    def desde_arrow(self, buffer):
+        return pa.ipc.open_stream(buffer).read_all().to_pandas()
+
+    # ------------------------------------------
+    # ARTEFACTO INTERMEDIO EN PARQUET
+    # ------------------------------------------
+    def guardar_parquet(self, df, ruta, tamano_grupo=100_000):
+        """
+        Guarda el resultado en Parquet (diccionario + zstd) para que la carga
+        lo lea conservando los tipos. Se escribe en grupos de filas de
+        `tamano_grupo` para poder leerlo luego por partes.
+        """
+        return self.guardar_lotes_parquet([df], ruta, tamano_grupo)
+
+    def guardar_lotes_parquet(self, lotes, ruta, tamano_grupo=100_000, esquema=None):
+        """
+        Escribe los lotes en un único Parquet. El esquema del archivo es
+        `esquema` o, si no se da, el del primer lote con los tipos
+        ensanchados (enteros a int64, float a float64, índices de
+        diccionario a int32), porque optimizar_tipos puede elegir tipos
+        distintos en cada lote. Las columnas que le faltan a un lote se
+        escriben como nulos.
+        """
+        escritor = None
+        total = 0
+        try:
+            for lote in lotes:
+                tabla = pa.Table.from_pandas(self.preparar_para_arrow(lote), preserve_index=False)
+                if escritor is None:
+                    esquema = esquema or pa.schema([pa.field(campo.name, self.ensanchar_tipo(campo.type))
+                                                    for campo in tabla.schema])
+                    escritor = pq.ParquetWriter(ruta, esquema, compression="zstd", use_dictionary=True)
+                escritor.write_table(self.ajustar_esquema(tabla, esquema, ruta), row_group_size=tamano_grupo)
+                total += tabla.num_rows
+        finally:
+            if escritor is not None:
+                escritor.close()
+
+        self.registrar_log(f"Parquet {ruta}: {total} registros")
+        return total
+
+    def ensanchar_tipo(self, tipo):
+        if pa.types.is_dictionary(tipo):
+            return pa.dictionary(pa.int32(), self.ensanchar_tipo(tipo.value_type))
+        if pa.types.is_integer(tipo) and tipo != pa.uint64():
+            return pa.int64()
+        if pa.types.is_floating(tipo):
+            return pa.float64()
+        if pa.types.is_null(tipo):
+            # Columna sin ningún valor en el primer lote: en Mongo suele ser texto
+            return pa.string()
+        return tipo
+
+    def ajustar_esquema(self, tabla, esquema, ruta=""):
+        extra = [nombre for nombre in tabla.column_names if nombre not in esquema.names]
+        if extra:
+            print(f"⚠️ Columnas que no están en el esquema de {ruta}, no se guardan: {', '.join(extra)}")
+            self.registrar_log(f"Parquet {ruta}: columnas fuera del esquema omitidas: {', '.join(extra)}")
+        columnas = [
+            tabla[campo.name].cast(campo.type) if campo.name in tabla.column_names
+            else pa.nulls(tabla.num_rows, type=campo.type)
+            for campo in esquema
+        ]
+        return pa.Table.from_arrays(columnas, schema=esquema)
+
+    def preparar_para_arrow(self, df):
+        # Columnas object con tipos que Arrow no sabe convertir (ObjectId)
+        # se guardan como texto; las listas se mantienen y los nulos también.
+        tipos_arrow = {"string", "boolean", "integer", "floating", "mixed-integer-float",
+                       "date", "datetime", "decimal", "bytes", "empty"}
+        columnas = {}
+        for col in df.columns:
+            serie = df[col]
+            if serie.dtype == object and pd.api.types.infer_dtype(serie, skipna=True) not in tipos_arrow:
+                try:
+                    pa.array(serie, from_pandas=True)
+                except (pa.ArrowInvalid, pa.ArrowTypeError):
+                    columnas[col] = serie.astype(str).where(serie.notna(), None)
+        return df.assign(**columnas) if columnas else df
+
+
+def _transformar_particion(tarea):
+    # Se ejecuta en cada proceso del pool
+    buffer, tipo, archivo_log = tarea
+    transformador = Transformacion(nombre_archivo_log=archivo_log)
+    df = transformador.desde_arrow(buffer)
+    return transformador.a_arrow(transformador.transformar(df, tipo, copiar=False))
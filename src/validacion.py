@@ -0,0 +1,356 @@
+"""
+Validación de calidad de datos entre la transformación y la carga.
+
+- Validacion: evalúa las reglas de cada colección sobre el lote completo
+  con máscaras vectorizadas (una por regla, sin recorrer filas en Python),
+  separa las filas que no cumplen alguna y las guarda en Cuarentena/<tipo>/
+  como Parquet junto con los nombres de las reglas que fallaron.
+- PerfilAproximado: estadísticas por columna que no guardan todas las filas:
+  tasa de nulos y cuantiles de una muestra uniforme de tamaño fijo y
+  cantidad aproximada de valores distintos con un HyperLogLog.
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from instrumentacion import CARPETA_LOGS, instrumentacion
+from transformacion import Transformacion
+
+
+# Airbnb se fundó en 2008: una fecha anterior es un error de origen
+FECHA_MINIMA = pd.Timestamp("2008-01-01")
+
+
+class PerfilAproximado:
+    """
+    Perfil de un flujo de lotes. La muestra se mantiene con bottom-k: cada
+    fila recibe un número aleatorio y se conservan las `tamano_muestra`
+    filas con los números más bajos, que es una muestra uniforme de todo el
+    flujo; una vez llena, de cada lote solo se copian las pocas filas que
+    entran. El HyperLogLog usa 2**precision registros (error ~1.04/sqrt(m)).
+    """
+
+    CUANTILES = (0.01, 0.25, 0.5, 0.75, 0.99)
+
+    def __init__(self, tamano_muestra=10_000, precision=12, semilla=None):
+        self.tamano_muestra = tamano_muestra
+        self.precision = precision
+        self.rng = np.random.default_rng(semilla)
+        self.muestra = None
+        self.claves_muestra = np.empty(0)
+        self.umbral = 1.0
+        self.pendientes = []
+        self.filas_pendientes = 0
+        self.registros = {}
+        self.filas = 0
+        self.candado = threading.Lock()
+
+    def agregar(self, df):
+        if df.empty:
+            return
+        claves = self.rng.random(len(df))
+        # Los registros del lote se calculan fuera del candado y se combinan
+        registros = {col: self.registros_hll(df[col]) for col in df.columns}
+        registros = {col: valores for col, valores in registros.items() if valores is not None}
+
+        with self.candado:
+            self.filas += len(df)
+            for col, valores in registros.items():
+                actuales = self.registros.get(col)
+                self.registros[col] = valores if actuales is None else np.maximum(actuales, valores)
+
+            # Las candidatas se acumulan y la muestra se recorta cuando hay
+            # tantas pendientes como su tamaño; mientras tanto el umbral
+            # anterior sigue siendo válido (solo deja pasar alguna de más)
+            entran = np.flatnonzero(claves < self.umbral)
+            if len(entran):
+                self.pendientes.append((df.iloc[entran], claves[entran]))
+                self.filas_pendientes += len(entran)
+            if self.filas_pendientes >= self.tamano_muestra:
+                self.compactar()
+
+    def compactar(self):
+        # Se llama con el candado tomado
+        if not self.pendientes:
+            return
+        partes = ([(self.muestra, self.claves_muestra)] if self.muestra is not None else []) + self.pendientes
+        muestra = pd.concat([parte for parte, _ in partes], ignore_index=True)
+        claves = np.concatenate([claves for _, claves in partes])
+        if len(claves) > self.tamano_muestra:
+            quedan = np.argpartition(claves, self.tamano_muestra - 1)[:self.tamano_muestra]
+            muestra, claves = muestra.iloc[quedan].reset_index(drop=True), claves[quedan]
+            self.umbral = claves.max()
+        self.muestra, self.claves_muestra = muestra, claves
+        self.pendientes = []
+        self.filas_pendientes = 0
+
+    def registros_hll(self, serie):
+        """
+        Registros HyperLogLog de los valores no nulos: los primeros bits del
+        hash eligen el registro y cada registro guarda el máximo de (ceros a
+        la izquierda + 1) del resto, calculado con frexp sobre un float64
+        exacto de hasta 52 bits. Las columnas de objetos que no son texto
+        (ObjectId, listas) no se cuentan: son identificadores o estructuras
+        y hashearlas cuesta más que todo el resto del lote.
+        """
+        if serie.dtype == object and pd.api.types.infer_dtype(serie, skipna=True) != "string":
+            return None
+        if serie.dtype.kind in "iubfmM":
+            # Columnas numpy: se hashea el arreglo directamente
+            valores = serie.to_numpy()
+            hashes = pd.util.hash_array(valores)
+            nulos = None
+            if valores.dtype.kind == "f":
+                nulos = np.isnan(valores)
+            elif valores.dtype.kind in "mM":
+                nulos = np.isnat(valores)
+        else:
+            hashes = pd.util.hash_pandas_object(serie, index=False).to_numpy()
+            nulos = serie.isna().to_numpy()
+
+        bits = 64 - self.precision
+        indices = (hashes >> np.uint64(bits)).astype(np.intp)
+        _, largo = np.frexp((hashes & np.uint64((1 << bits) - 1)).astype(np.float64))
+        rangos = (bits + 1 - largo).astype(np.uint8)
+        if nulos is not None:
+            # Un rango 0 no cambia el registro: los nulos no cuentan
+            rangos[nulos] = 0
+        registros = np.zeros(1 << self.precision, dtype=np.uint8)
+        np.maximum.at(registros, indices, rangos)
+        return registros
+
+    def distintos(self, registros):
+        m = len(registros)
+        alfa = 0.7213 / (1 + 1.079 / m)
+        estimado = alfa * m * m / np.sum(np.ldexp(1.0, -registros.astype(np.int64)))
+        vacios = int(np.count_nonzero(registros == 0))
+        if estimado <= 2.5 * m and vacios:
+            # Corrección para cardinalidades bajas (conteo lineal)
+            estimado = m * np.log(m / vacios)
+        return int(round(estimado))
+
+    def resumen(self):
+        """
+        Devuelve {columna: {"tasa_nulos", "distintos_aprox", "cuantiles"}};
+        los cuantiles solo para columnas numéricas y de fecha.
+        """
+        with self.candado:
+            self.compactar()
+            muestra = self.muestra if self.muestra is not None else pd.DataFrame()
+            columnas = {}
+            for col in muestra.columns:
+                serie = muestra[col]
+                registros = self.registros.get(col)
+                columnas[col] = {
+                    "tasa_nulos": round(float(serie.isna().mean()), 4) if len(serie) else None,
+                    "distintos_aprox": self.distintos(registros) if registros is not None else None,
+                    "cuantiles": self.cuantiles(serie),
+                }
+            return {"filas": self.filas, "muestra": len(muestra), "columnas": columnas}
+
+    def cuantiles(self, serie):
+        serie = serie.dropna()
+        if serie.empty or not (pd.api.types.is_numeric_dtype(serie) or pd.api.types.is_datetime64_any_dtype(serie)):
+            return None
+        if pd.api.types.is_bool_dtype(serie):
+            return None
+        valores = serie.quantile(list(self.CUANTILES))
+        return {f"p{int(q * 100):02d}": str(valor) if isinstance(valor, pd.Timestamp) else round(float(valor), 4)
+                for q, valor in zip(self.CUANTILES, valores)}
+
+
+class Validacion:
+    """
+    Reglas de calidad por colección, cuarentena y perfil de las filas que
+    pasan. Con `fraccion_perfil` < 1 solo se perfila esa fracción de los
+    lotes, elegidos al azar: la tasa de nulos y los cuantiles siguen siendo
+    estimaciones de todo el flujo, pero `distintos_aprox` pasa a ser una
+    cota inferior.
+    """
+
+    # Reglas por colección: (nombre, método, columna, nulos válidos). Una
+    # regla cuya columna no está en el lote no se evalúa.
+    REGLAS = {
+        "listings": [
+            ("precio_positivo", "positivo", "price", True),
+            ("host_since_en_ventana", "en_ventana", "host_since", True),
+            ("clave_unica", "clave_unica", "_id", False),
+        ],
+        "reviews": [
+            ("fecha_en_ventana", "en_ventana", "date", False),
+            ("clave_unica", "clave_unica", "_id", False),
+        ],
+        "calendar": [
+            ("precio_positivo", "positivo", "price", True),
+            ("fecha_en_ventana", "en_ventana", "date", False),
+            ("clave_unica", "clave_unica", "listing_id", False),
+            ("available_booleano", "booleano", "available", False),
+        ],
+    }
+
+    def __init__(self, fecha_scrape=None, carpeta_cuarentena="Cuarentena", tamano_muestra=10_000,
+                 fraccion_perfil=1.0, nombre_archivo_log="logs_validacion.txt"):
+        ruta_base = os.path.dirname(os.path.abspath(__file__))
+        self.carpeta_cuarentena = os.path.join(ruta_base, carpeta_cuarentena)
+        self.fecha_scrape = pd.Timestamp(fecha_scrape) if fecha_scrape is not None else None
+        self.tamano_muestra = tamano_muestra
+        # En corridas grandes basta perfilar una fracción de los lotes
+        self.fraccion_perfil = fraccion_perfil
+        self.rng = np.random.default_rng()
+        self.transformador = Transformacion(nombre_archivo_log=nombre_archivo_log)
+        self.perfiles = {}
+        self.conteos = {}
+        self.contador = 0
+        self.candado = threading.Lock()
+
+    # ------------------------------------------
+    # VALIDACIÓN POR LOTE
+    # ------------------------------------------
+    def validar(self, df, tipo):
+        """
+        Devuelve las filas de `df` que cumplen todas las reglas de `tipo`.
+        Las demás se guardan en cuarentena con la columna `reglas_fallidas`.
+        """
+        if df.empty:
+            return df
+
+        with instrumentacion.etapa("validar", tipo) as datos:
+            reglas = [regla for regla in self.REGLAS[tipo] if regla[2] in df.columns]
+            # Un bit por regla: una sola pasada por regla y un arreglo para todas
+            fallas = np.zeros(len(df), dtype=np.uint32)
+            fallidas_por_regla = {}
+            for bit, (nombre, metodo, columna, nulos_validos) in enumerate(reglas):
+                invalida = ~getattr(self, metodo)(df, tipo, columna, nulos_validos)
+                fallas |= invalida.astype(np.uint32) << np.uint32(bit)
+                fallidas_por_regla[nombre] = int(np.count_nonzero(invalida))
+
+            validas = fallas == 0
+            if not validas.all():
+                self.poner_en_cuarentena(df[~validas], fallas[~validas], [regla[0] for regla in reglas], tipo)
+                df = df[validas]
+
+            if self.perfilar():
+                self.perfil(tipo).agregar(df)
+            self.contar(tipo, len(validas), int(np.count_nonzero(~validas)), fallidas_por_regla)
+            datos["filas"] = len(validas)
+            datos["bytes"] = df.memory_usage(index=False).sum()
+        return df
+
+    def positivo(self, df, tipo, columna, nulos_validos):
+        serie = df[columna]
+        if not pd.api.types.is_numeric_dtype(serie):
+            serie = pd.to_numeric(serie, errors="coerce")
+        valores = serie.to_numpy(dtype=np.float64, na_value=np.nan)
+        return (valores > 0) | (nulos_validos & np.isnan(valores))
+
+    def en_ventana(self, df, tipo, columna, nulos_validos):
+        inicio, fin = self.ventana(tipo)
+        fechas = df[columna]
+        if not pd.api.types.is_datetime64_any_dtype(fechas):
+            fechas = pd.to_datetime(fechas, errors="coerce")
+        fechas = fechas.to_numpy(dtype="datetime64[ns]")
+        return ((fechas >= inicio.to_datetime64()) & (fechas <= fin.to_datetime64())) | (nulos_validos & np.isnat(fechas))
+
+    def clave_unica(self, df, tipo, columna, nulos_validos):
+        # La unicidad entre lotes ya la garantiza Transformacion.filtrar_duplicados
+        claves = [col for col in Transformacion.CLAVES_DUPLICADOS[tipo] if col in df.columns]
+        return ~df.duplicated(subset=claves, keep="first").to_numpy()
+
+    def booleano(self, df, tipo, columna, nulos_validos):
+        serie = df[columna]
+        if serie.dtype == bool:
+            return np.ones(len(serie), dtype=bool)
+        return serie.isin([True, False]).to_numpy() | (nulos_validos & serie.isna().to_numpy())
+
+    def ventana(self, tipo):
+        """
+        Fechas válidas de cada colección. Calendar publica el año siguiente
+        al scrape; reviews y host_since no pueden ser posteriores al scrape.
+        Sin fecha de scrape se usa hoy como límite.
+        """
+        referencia = self.fecha_scrape if self.fecha_scrape is not None else pd.Timestamp.now().normalize()
+        if tipo == "calendar":
+            inicio = referencia - pd.Timedelta(days=1) if self.fecha_scrape is not None else FECHA_MINIMA
+            return inicio, referencia + pd.Timedelta(days=366)
+        return FECHA_MINIMA, referencia + pd.Timedelta(days=1)
+
+    # ------------------------------------------
+    # CUARENTENA
+    # ------------------------------------------
+    def poner_en_cuarentena(self, df, fallas, nombres, tipo):
+        # Los nombres se arman una vez por combinación distinta de fallas
+        codigos, combinaciones = pd.factorize(fallas)
+        etiquetas = np.array([
+            ",".join(nombre for bit, nombre in enumerate(nombres) if combinacion >> bit & 1)
+            for combinacion in combinaciones
+        ], dtype=object)
+        cuarentena = df.assign(reglas_fallidas=etiquetas[codigos], fecha_cuarentena=datetime.now())
+
+        carpeta = os.path.join(self.carpeta_cuarentena, tipo)
+        os.makedirs(carpeta, exist_ok=True)
+        with self.candado:
+            self.contador += 1
+            nombre = f"{time.time_ns()}_{os.getpid()}_{self.contador}.parquet"
+        try:
+            self.transformador.guardar_parquet(cuarentena, os.path.join(carpeta, nombre))
+        except Exception as e:
+            print(f"No se pudo guardar la cuarentena de {tipo}: {e}")
+        self.transformador.registrar_log(
+            f"{tipo.upper()}: {len(df)} registros en cuarentena ({', '.join(pd.unique(etiquetas))})"
+        )
+
+    # ------------------------------------------
+    # ESTADÍSTICAS
+    # ------------------------------------------
+    def perfilar(self):
+        if self.fraccion_perfil >= 1:
+            return True
+        with self.candado:
+            return self.rng.random() < self.fraccion_perfil
+
+    def perfil(self, tipo):
+        with self.candado:
+            if tipo not in self.perfiles:
+                self.perfiles[tipo] = PerfilAproximado(self.tamano_muestra)
+            return self.perfiles[tipo]
+
+    def contar(self, tipo, filas, en_cuarentena, fallidas_por_regla):
+        with self.candado:
+            conteo = self.conteos.setdefault(tipo, {"filas": 0, "en_cuarentena": 0, "reglas": {}})
+            conteo["filas"] += filas
+            conteo["en_cuarentena"] += en_cuarentena
+            for nombre, fallidas in fallidas_por_regla.items():
+                conteo["reglas"][nombre] = conteo["reglas"].get(nombre, 0) + fallidas
+
+    def resumen(self, archivo="calidad.json"):
+        """
+        Imprime las filas en cuarentena por regla y escribe en Logs/ el
+        resumen con el perfil aproximado de cada colección.
+        """
+        with self.candado:
+            tipos = {tipo: dict(conteo, reglas=dict(conteo["reglas"])) for tipo, conteo in self.conteos.items()}
+            perfiles = dict(self.perfiles)
+        for tipo, conteo in tipos.items():
+            # Con fraccion_perfil < 1 puede que ningún lote del tipo se haya perfilado
+            perfil = perfiles.get(tipo)
+            conteo["perfil"] = perfil.resumen() if perfil is not None else None
+
+        print("\n🔎 VALIDACIÓN")
+        for tipo, conteo in tipos.items():
+            fallidas = ", ".join(f"{nombre} {cantidad:,}" for nombre, cantidad in conteo["reglas"].items() if cantidad)
+            print(f"   {tipo}: {conteo['en_cuarentena']:,} de {conteo['filas']:,} filas en cuarentena"
+                  + (f" ({fallidas})" if fallidas else ""))
+
+        datos = {"fecha": datetime.now().isoformat(), "tipos": tipos}
+        try:
+            with open(os.path.join(CARPETA_LOGS, archivo), "w", encoding="utf-8") as salida:
+                json.dump(datos, salida, indent=2, default=str)
+        except Exception as e:
+            print(f"No se pudo escribir el resumen de calidad: {e}")
+        return datos